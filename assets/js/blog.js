@@ -6,12 +6,16 @@ document.addEventListener('DOMContentLoaded', function() {
     
     const itemsPerBatch = 8; // Larger batches reduce how often the layout shifts during long scrolls
     const mobileBreakpoint = 736;
+    // One column on mobile, otherwise half of the 72rem main column
+    const imageSizes = `(max-width: ${mobileBreakpoint}px) 100vw, min(50vw, 36rem)`;
     let displayedCount = 0;
     let currentData = []; // Will hold filtered data
     let isLoading = false; // Prevent rapid-fire loading
     let scrollObserver = null; // IntersectionObserver instance
     let renderVersion = 0; // Discard stale async renders
     const imageMetadataCache = new Map();
+    let imageVariants = {}; // blog.yaml image path -> [{ src, width }], built by resize_images.py
+    let imageMetaIndex = {}; // blog.yaml image path -> { width, height, color, lqip }, built by resize_images.py
     let resizeTimeout = null;
 
     function getImageSource(item) {
@@ -31,6 +35,13 @@ document.addEventListener('DOMContentLoaded', function() {
             return imageMetadataCache.get(src);
         }
 
+        // Build-time metadata lets the card render at its final size right away
+        if (imageMetaIndex[src]) {
+            const metadataPromise = Promise.resolve(imageMetaIndex[src]);
+            imageMetadataCache.set(src, metadataPromise);
+            return metadataPromise;
+        }
+
         const metadataPromise = new Promise(resolve => {
             const img = new Image();
 
@@ -115,11 +126,25 @@ document.addEventListener('DOMContentLoaded', function() {
             const sizeAttributes = imageMeta
                 ? ` width="${imageMeta.width}" height="${imageMeta.height}"`
                 : '';
-            const smallImageStyle = imageMeta && imageMeta.width < 600
-                ? ` style="max-width: min(100%, ${imageMeta.width}px); margin: 0 auto; display: block;"`
+            const imageStyles = [];
+            if (imageMeta && imageMeta.width < 600) {
+                imageStyles.push(`max-width: min(100%, ${imageMeta.width}px); margin: 0 auto; display: block;`);
+            }
+            // Blurred placeholder until the real image paints over it
+            if (imageMeta && imageMeta.color) {
+                imageStyles.push(`background-color: ${imageMeta.color};`);
+            }
+            if (imageMeta && imageMeta.lqip) {
+                imageStyles.push(`background-image: url('${imageMeta.lqip}'); background-size: cover;`);
+            }
+            const imageStyle = imageStyles.length > 0 ? ` style="${imageStyles.join(' ')}"` : '';
+
+            const variants = imageVariants[imageSrc];
+            const srcsetAttributes = Array.isArray(variants) && variants.length > 1
+                ? ` srcset="${variants.map(variant => `${variant.src} ${variant.width}w`).join(', ')}" sizes="${imageSizes}"`
                 : '';
 
-            imageHtml = `<span class="image fit"><img src="${imageSrc}" alt="${altText}" loading="lazy" decoding="async"${sizeAttributes}${smallImageStyle} /></span>`;
+            imageHtml = `<span class="image fit"><img src="${imageSrc}"${srcsetAttributes} alt="${altText}" loading="lazy" decoding="async"${sizeAttributes}${imageStyle} /></span>`;
         }
 
         let linkHtml = '';
@@ -255,10 +280,32 @@ document.addEventListener('DOMContentLoaded', function() {
 
     let blogData = []; // Will hold all data loaded from YAML
 
+    // The variants map is optional: without it every card uses the plain src
+    async function loadImageVariants() {
+        try {
+            imageVariants = await loadJsonData('content/images.variants.json');
+        } catch (e) {
+            imageVariants = {};
+        }
+    }
+
+    // Optional too: without it dimensions are measured by preloading each image
+    async function loadImageMeta() {
+        try {
+            imageMetaIndex = await loadJsonData('content/images.meta.json');
+        } catch (e) {
+            imageMetaIndex = {};
+        }
+    }
+
     // Function to load and parse YAML data
     async function loadBlogData() {
         try {
-            blogData = await loadYamlData('content/blog.yaml');
+            [blogData] = await Promise.all([
+                loadYamlData('content/blog.yaml'),
+                loadImageVariants(),
+                loadImageMeta()
+            ]);
             
             if (blogData && blogData.length > 0) {
                 initializeBlog();
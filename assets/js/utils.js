@@ -185,6 +185,15 @@ async function loadYamlData(path) {
     return jsyaml.load(text);
 }
 
+// Load and parse JSON data from a file path
+async function loadJsonData(path) {
+    const response = await fetch(path);
+    if (!response.ok) {
+        throw new Error(`Failed to load ${path}: ${response.status} ${response.statusText}`);
+    }
+    return response.json();
+}
+
 // Safely get a property value with a default fallback
 function safeGet(obj, key, defaultValue = '') {
     return (obj && obj[key] != null) ? obj[key] : defaultValue;
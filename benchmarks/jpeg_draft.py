@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark the reduced-scale JPEG decode used by resize_images.py.
+
+Compares a full-resolution decode + LANCZOS resize against a draft() decode
+(DCT scaling) + LANCZOS resize for the same target size, reporting time,
+decoded pixels, peak RSS and how close the two outputs are (PSNR and SSIM
+on luma). For scale, the same metrics are shown for the loss the WebP
+encoder itself adds at QUALITY.
+
+Without arguments, 24MP and 50MP test JPEGs are made by upscaling the
+largest photo in content/images.
+
+Usage:
+    python benchmarks/jpeg_draft.py
+    python benchmarks/jpeg_draft.py photo1.jpg photo2.jpg
+"""
+from __future__ import annotations
+
+import io
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageOps
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from resize_images import METHOD, QUALITY, target_size  # noqa: E402
+
+SAMPLE = REPO_ROOT / "content" / "images" / "20250914_tuinenfestival_castricum.jpg"
+SAMPLE_MEGAPIXELS = (24, 50)
+ROUNDS = 3
+
+
+def decode_and_resize(path: Path, draft: bool) -> tuple[Image.Image, tuple[int, int]]:
+    """The resize_images.py conversion path, with or without draft()."""
+    with Image.open(path) as im:
+        target = target_size(*im.size)
+        if target and draft:
+            im.draft(None, target)
+        im = ImageOps.exif_transpose(im)
+        decoded = im.size
+        if target:
+            if (im.width > im.height) != (target[0] > target[1]):
+                target = (target[1], target[0])
+            im = im.resize(target, resample=Image.Resampling.LANCZOS)
+        return im.convert("RGB"), decoded
+
+
+def measure(path: Path, draft: bool) -> dict:
+    """Run in a fresh process so ru_maxrss reflects only this decode."""
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        out, decoded = decode_and_resize(path, draft)
+        best = min(best, time.perf_counter() - start)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    return {
+        "seconds": best,
+        "decoded": decoded,
+        "peak_mb": peak / 1024,
+        "pixels": np.asarray(out),
+    }
+
+
+def luma(pixels: np.ndarray) -> np.ndarray:
+    return pixels[..., :3].astype(np.float64) @ np.array([0.299, 0.587, 0.114])
+
+
+def psnr(a: np.ndarray, b: np.ndarray) -> float:
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return float("inf") if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+
+def ssim(a: np.ndarray, b: np.ndarray, block: int = 8) -> float:
+    """Mean SSIM over non-overlapping 8x8 luma blocks."""
+    x, y = luma(a), luma(b)
+    h, w = (x.shape[0] // block) * block, (x.shape[1] // block) * block
+    x = x[:h, :w].reshape(h // block, block, w // block, block).swapaxes(1, 2)
+    y = y[:h, :w].reshape(h // block, block, w // block, block).swapaxes(1, 2)
+    mx, my = x.mean(axis=(2, 3)), y.mean(axis=(2, 3))
+    vx, vy = x.var(axis=(2, 3)), y.var(axis=(2, 3))
+    cov = ((x - mx[..., None, None]) * (y - my[..., None, None])).mean(axis=(2, 3))
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    score = ((2 * mx * my + c1) * (2 * cov + c2)) / ((mx ** 2 + my ** 2 + c1) * (vx + vy + c2))
+    return float(score.mean())
+
+
+def webp_roundtrip(pixels: np.ndarray) -> np.ndarray:
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "WEBP", quality=QUALITY, method=METHOD)
+    buffer.seek(0)
+    with Image.open(buffer) as im:
+        return np.asarray(im.convert("RGB"))
+
+
+def make_samples(tmp: Path) -> list[Path]:
+    """Upscale the sample photo to camera-like resolutions."""
+    paths = []
+    with Image.open(SAMPLE) as im:
+        im = ImageOps.exif_transpose(im).convert("RGB")
+        for megapixels in SAMPLE_MEGAPIXELS:
+            scale = (megapixels * 1_000_000 / (im.width * im.height)) ** 0.5
+            size = (round(im.width * scale), round(im.height * scale))
+            path = tmp / f"sample_{megapixels}mp.jpg"
+            im.resize(size, resample=Image.Resampling.BICUBIC).save(path, quality=92)
+            paths.append(path)
+    return paths
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [Path(arg) for arg in sys.argv[1:]] or make_samples(Path(tmp))
+
+        print(f"{'image':<28} {'path':<6} {'decoded':>11} {'time':>8} {'peak RSS':>9}")
+        for path in paths:
+            results = {}
+            for draft in (False, True):
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    results[draft] = executor.submit(measure, path, draft).result()
+            with Image.open(path) as im:
+                label = f"{path.name} ({im.width * im.height / 1e6:.0f}MP)"
+            for draft, name in ((False, "full"), (True, "draft")):
+                r = results[draft]
+                decoded = "x".join(map(str, r["decoded"]))
+                print(f"{label:<28} {name:<6} {decoded:>11} {r['seconds']:>7.2f}s {r['peak_mb']:>7.0f}MB")
+            full, fast = results[False], results[True]
+            print(
+                f"{'':<28} speedup {full['seconds'] / fast['seconds']:.1f}x, "
+                f"PSNR {psnr(full['pixels'], fast['pixels']):.1f} dB, "
+                f"SSIM {ssim(full['pixels'], fast['pixels']):.4f}"
+            )
+            encoded = webp_roundtrip(full["pixels"])
+            print(
+                f"{'':<28} (WebP q{QUALITY} encode alone: "
+                f"PSNR {psnr(full['pixels'], encoded):.1f} dB, SSIM {ssim(full['pixels'], encoded):.4f})"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
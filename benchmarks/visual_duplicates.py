@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark the near-duplicate search of manage_blog_images.py.
+
+Compares the multi-index hash lookup (group_similar) against the previous
+all-pairs loop over ImageHash objects, on synthetic 64-bit perceptual hashes:
+random images plus small clusters of near copies (a few flipped bits, as a
+recompressed or resized copy gives). Both must produce the same groups; the
+all-pairs loop is skipped once it would take longer than PAIRWISE_LIMIT
+seconds (estimated from the previous size).
+
+Usage:
+    python benchmarks/visual_duplicates.py
+    python benchmarks/visual_duplicates.py 1000 10000 100000
+"""
+from __future__ import annotations
+
+import random
+import sys
+import time
+from pathlib import Path
+
+import imagehash
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from manage_blog_images import HASH_DISTANCE_THRESHOLD, group_similar, hash_to_int  # noqa: E402
+
+SIZES = (50, 100, 250, 500, 1000, 2000, 5000, 10000, 50000)
+BITS = 64
+PAIRWISE_LIMIT = 60.0
+
+
+def synthetic_hashes(n: int, seed: int = 0) -> list[imagehash.ImageHash]:
+    """n hashes: a quarter of them near copies (1-6 bits flipped) of another."""
+    rng = random.Random(seed)
+    values: list[int] = []
+    while len(values) < n:
+        if values and rng.random() < 0.25:
+            value = rng.choice(values)
+            for bit in rng.sample(range(BITS), rng.randint(1, 6)):
+                value ^= 1 << bit
+        else:
+            value = rng.getrandbits(BITS)
+        values.append(value)
+    return [
+        imagehash.ImageHash(np.array([(value >> (BITS - 1 - i)) & 1 for i in range(BITS)], dtype=bool).reshape(8, 8))
+        for value in values
+    ]
+
+
+def pairwise_groups(hashes: list[imagehash.ImageHash]) -> list[list[int]]:
+    """The previous implementation: union-find over all pairs."""
+    n = len(hashes)
+    parent = list(range(n))
+
+    def find(x):
+        if parent[x] != x:
+            parent[x] = find(parent[x])
+        return parent[x]
+
+    for i in range(n):
+        for j in range(i + 1, n):
+            if hashes[i] - hashes[j] <= HASH_DISTANCE_THRESHOLD:
+                pi, pj = find(i), find(j)
+                if pi != pj:
+                    parent[pi] = pj
+
+    groups: dict[int, list[int]] = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def canonical(groups: list[list[int]]) -> set[tuple[int, ...]]:
+    return {tuple(sorted(group)) for group in groups if len(group) > 1}
+
+
+def main() -> int:
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f"{'n':>7} {'all pairs':>11} {'index':>9} {'speedup':>8}  groups")
+    pairwise_estimate = 0.0
+    for n in sizes:
+        hashes = synthetic_hashes(n)
+        values = [hash_to_int(h) for h in hashes]
+
+        start = time.perf_counter()
+        indexed = group_similar(values, BITS)
+        index_seconds = time.perf_counter() - start
+
+        if pairwise_estimate <= PAIRWISE_LIMIT:
+            start = time.perf_counter()
+            expected = pairwise_groups(hashes)
+            pairwise_seconds = time.perf_counter() - start
+            pairwise_estimate = pairwise_seconds * 4  # the next size is usually about double
+            if canonical(indexed) != canonical(expected):
+                print(f"MISMATCH at n={n}")
+                return 1
+            print(
+                f"{n:>7} {pairwise_seconds:>10.3f}s {index_seconds:>8.3f}s "
+                f"{pairwise_seconds / index_seconds:>7.1f}x  {len(canonical(indexed))}"
+            )
+        else:
+            print(f"{n:>7} {'-':>11} {index_seconds:>8.3f}s {'':>8}  {len(canonical(indexed))}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,28 +3,81 @@
 Validate and optionally apply the Anyway blog cleanup workflow.
 
 Default mode is a dry-run report. Use --apply for mechanical image fixes.
+The dry run saves the image manager's plan to content/.image-plan.json and
+--apply carries out exactly that plan. If the files it touches changed since
+(for example because resize_images converted an image the plan renames),
+nothing is renamed or deleted and the stage fails: run the dry run again to
+review the new plan, then --apply.
 Text edits remain a scoped review step for Codex or a human editor.
+
+The image tools run in this process through their run() entry points, on one
+parsed blog.yaml (BlogYaml) and one listing of content/images
+(ImageCatalog), and the content files are checked by validate_content.py;
+only git is started as a separate process.
+
+With --parallel the stages that only read the tree (all of them in a dry
+run; YAML, Scoped Blog Diff and Image References with --apply) run at the
+same time in threads. Each stage's output is buffered and printed in the
+usual order, so the report reads the same; the run takes about as long as
+its slowest stage. The Result section lists the wall time of every stage.
+
+The Page Weight stage adds up what the blog feed downloads per batch of
+entries (as assets/js/blog.js loads them, with the srcset candidate its
+sizes attribute picks on each of DEVICES) and fails if the first screen is
+over --batch-budget on any of them.
 """
 
 from __future__ import annotations
 
 import argparse
+import difflib
+import io
+import math
+import os
+import py_compile
 import re
 import subprocess
 import sys
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 
-from manage_blog_images import (
-    YAML_PATH,
-    get_expected_filename,
-    is_correctly_named,
-    parse_blog_yaml,
-)
+import manage_blog_images
+import resize_images
+import validate_content
+from PIL import Image
+
+from blog_yaml import BlogYaml, Entry, EntryDiff, diff_entries, image_key, parse_dutch_date
+from git_scope import GitObjects
+from manage_blog_images import ImageCatalog, get_expected_filename, is_correctly_named
 
 
 REPO_ROOT = Path(__file__).resolve().parent
 IMAGES_DIR = REPO_ROOT / "content" / "images"
-BLOG_YAML = REPO_ROOT / "content" / "blog.yaml"
+BLOG_PATH = "content/blog.yaml"
+BLOG_YAML = REPO_ROOT / BLOG_PATH
+IMAGE_PLAN = REPO_ROOT / "content" / ".image-plan.json"
+# Fields whose text is reviewed for spelling and grammar
+PROSE_FIELDS = ("title", "content")
+
+# The blog feed as assets/js/blog.js loads it: newest first, itemsPerBatch
+# entries at a time, each image sized by its imageSizes,
+# "(max-width: 736px) 100vw, min(50vw, 36rem)"
+ITEMS_PER_BATCH = 8
+MOBILE_BREAKPOINT = 736
+COLUMN_MAX_WIDTH = 36 * 16
+# Visitors the feed is weighed for: (name, viewport CSS px, device pixel ratio)
+DEVICES = (
+    ("phone", 390, 2),
+    ("tablet", 820, 2),
+    ("laptop", 1440, 1),
+    ("retina laptop", 1440, 2),
+)
+IMAGE_BUDGET = 512 * 1024
+BATCH_BUDGET = 2560 * 1024
 
 
 def run(command: list[str], *, check: bool = True) -> subprocess.CompletedProcess[str]:
@@ -38,6 +91,92 @@ def run(command: list[str], *, check: bool = True) -> subprocess.CompletedProces
     )
 
 
+@dataclass
+class Stage:
+    """One section of the report: a check that prints and returns ok."""
+
+    title: str
+    check: Callable[[], bool]
+    # May run at the same time as the stages around it (does not change the tree)
+    parallel: bool = True
+    ok: bool = False
+    seconds: float = 0.0
+
+
+class StageOutput:
+    """Stand-in for sys.stdout that sends a stage thread's output to its own buffer.
+
+    Threads without a buffer (the main thread) write to the real stream.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def target(self):
+        return getattr(self.local, "buffer", None) or self.stream
+
+    def write(self, text: str) -> int:
+        return self.target().write(text)
+
+    def flush(self) -> None:
+        self.target().flush()
+
+    def __getattr__(self, name: str):
+        return getattr(self.stream, name)
+
+    def capture(self, stage: Stage) -> str:
+        """Run stage in this thread and return what it printed."""
+        self.local.buffer = io.StringIO()
+        try:
+            run_stage(stage)
+            return self.local.buffer.getvalue()
+        finally:
+            self.local.buffer = None
+
+
+def run_stage(stage: Stage) -> None:
+    start = time.perf_counter()
+    try:
+        stage.ok = stage.check()
+    finally:
+        stage.seconds = time.perf_counter() - start
+
+
+def run_stages(stages: list[Stage], parallel: bool) -> None:
+    """Run the stages, printing their sections in list order.
+
+    With parallel, each run of consecutive parallel stages is started at
+    once in a thread pool; a stage that is not parallel starts after every
+    stage before it has finished and prints directly (it may prompt).
+    """
+    position = 0
+    while position < len(stages):
+        batch = [stages[position]]
+        if parallel and batch[0].parallel:
+            while position + len(batch) < len(stages) and stages[position + len(batch)].parallel:
+                batch.append(stages[position + len(batch)])
+        position += len(batch)
+
+        if len(batch) == 1:
+            print_section(batch[0].title)
+            run_stage(batch[0])
+            continue
+
+        sys.stdout.flush()
+        output = StageOutput(sys.stdout)
+        sys.stdout = output
+        try:
+            with ThreadPoolExecutor(max_workers=len(batch)) as pool:
+                futures = [pool.submit(output.capture, stage) for stage in batch]
+                # Print each section as soon as it and the ones before it are done
+                for stage, future in zip(batch, futures):
+                    print_section(stage.title)
+                    output.stream.write(future.result())
+        finally:
+            sys.stdout = output.stream
+
+
 def print_section(title: str) -> None:
     print()
     print("=" * 72)
@@ -46,56 +185,92 @@ def print_section(title: str) -> None:
 
 
 def validate_yaml() -> bool:
-    result = run(
-        [
-            "ruby",
-            "-e",
-            (
-                "require 'yaml'; "
-                "data = YAML.load_file('content/blog.yaml'); "
-                "abort('content/blog.yaml must contain a list') unless data.is_a?(Array); "
-                "puts \"YAML OK: #{data.length} entries\""
-            ),
-        ],
-        check=False,
-    )
-    print(result.stdout.rstrip())
-    return result.returncode == 0
+    return validate_content.report(validate_content.validate_all())
 
 
-def changed_blog_diff(since: str) -> tuple[str | None, str]:
+def changed_blog_entries(since: str) -> tuple[str | None, BlogYaml, BlogYaml, EntryDiff]:
+    """Base commit before since, blog.yaml there and at HEAD, and their entry diff.
+
+    Both versions are read through one git cat-file session.
+    """
     base = run(
         ["git", "rev-list", "-1", f"--before={since}", "HEAD"],
         check=False,
-    ).stdout.strip()
+    ).stdout.strip() or None
 
-    if not base:
-        base = run(["git", "hash-object", "-t", "tree", "/dev/null"]).stdout.strip()
+    with GitObjects(REPO_ROOT) as objects:
+        old = blog_at(objects, base)
+        new = blog_at(objects, "HEAD")
+    return base, old, new, diff_entries(old, new)
 
-    diff = run(
-        ["git", "diff", "--unified=0", f"{base}..HEAD", "--", "content/blog.yaml"],
-        check=False,
-    ).stdout
-    return base, diff
 
+def blog_at(objects: GitObjects, rev: str | None) -> BlogYaml:
+    """blog.yaml at rev; empty without a rev or where the file did not exist."""
+    data = objects.read(rev, BLOG_PATH) if rev else None
+    return BlogYaml((data or b"").decode("utf-8"))
 
-def added_text_lines(diff: str) -> list[str]:
-    lines: list[str] = []
-    for line in diff.splitlines():
-        if not line.startswith("+") or line.startswith("+++"):
-            continue
-        text = line[1:]
-        if not text.strip():
-            continue
-        if re.match(r"\s*(title|date|image|link|content):", text):
-            continue
-        lines.append(text)
+
+def entry_label(entry: Entry) -> str:
+    return f"{entry.get('date', '?')}: {entry.get('title', '(no title)')}"
+
+
+def changed_lines(old: list[str], new: list[str]) -> list[tuple[str, str]]:
+    """("-", line) and ("+", line) for the lines that differ between old and new."""
+    lines = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag != "equal":
+            lines += [("-", line) for line in old[i1:i2]] + [("+", line) for line in new[j1:j2]]
     return lines
 
 
-def validate_images() -> bool:
+def print_entry_diff(old: BlogYaml, new: BlogYaml, diff: EntryDiff) -> list[str]:
+    """Print the added, removed and changed entries; return the new prose lines."""
+    prose: list[str] = []
+    print(
+        f"Entries: {len(diff.added)} added, {len(diff.removed)} removed, "
+        f"{len(diff.changed)} changed, {diff.moved} moved"
+    )
+    for sign, blog, entries in (("+", new, diff.added), ("-", old, diff.removed)):
+        for entry in entries:
+            print()
+            print(f"{sign} {entry_label(entry)} (line {entry.line})")
+            for name in entry:
+                lines = blog.value_lines(entry, name)
+                print(f"    {name}: {lines[0] if lines else ''}")
+                for line in lines[1:]:
+                    print(f"      {line}")
+                if sign == "+" and name in PROSE_FIELDS:
+                    prose += lines
+    for before, entry, names in diff.changed:
+        print()
+        print(f"~ {entry_label(entry)} (line {entry.line}, was {before.line})")
+        for name in names:
+            print(f"    {name}:")
+            for sign, line in changed_lines(old.value_lines(before, name), new.value_lines(entry, name)):
+                print(f"      {sign} {line}")
+                if sign == "+" and name in PROSE_FIELDS:
+                    prose.append(line)
+    return prose
+
+
+def review_blog_diff(since: str) -> bool:
+    base, old, new, diff = changed_blog_entries(since)
+    print(f"Base before {since}: {base or '(none)'}")
+    if diff.added or diff.removed or diff.changed or diff.moved:
+        text_lines = [line for line in print_entry_diff(old, new, diff) if line.strip()]
+        if text_lines:
+            print()
+            print("Review these added/changed prose lines for spelling and grammar:")
+            for line in text_lines[:40]:
+                print(f"  {line.strip()}")
+    else:
+        print("No committed content/blog.yaml changes found in the scoped range.")
+    return True
+
+
+def validate_images(blog: BlogYaml, catalog: ImageCatalog) -> bool:
     ok = True
-    entries = parse_blog_yaml(YAML_PATH)
+    entries = blog.entries
 
     missing: list[tuple[str, str]] = []
     spaces: list[tuple[str, str]] = []
@@ -109,7 +284,9 @@ def validate_images() -> bool:
             continue
 
         image_path = REPO_ROOT / image
-        if not image_path.exists():
+        # Files directly in content/images are looked up in the listing
+        listed = Path(image).parent == Path("content/images") and catalog.exists(catalog.directory / image_path.name)
+        if not listed and not image_path.exists():
             missing.append((title, image))
 
         if re.search(r"\s", image):
@@ -157,32 +334,171 @@ def validate_images() -> bool:
     return ok
 
 
-def run_image_tools(apply: bool) -> bool:
-    resize_command = ["python3", "resize_images.py"]
-    if not apply:
-        resize_command.append("--dry-run")
+def feed_order(blog: BlogYaml) -> list[Entry]:
+    """Entries in the order the feed shows them: newest first, undated last."""
+    return sorted(blog.entries, key=lambda entry: parse_dutch_date(entry.get("date", "")) or "0", reverse=True)
 
-    print("$ " + " ".join(resize_command))
-    resize = run(resize_command, check=False)
-    print(resize.stdout.rstrip())
 
-    manager_command = ["python3", "manage_blog_images.py"]
-    if apply:
-        manager_command.append("--apply")
+def slot_width(viewport: int, density: float) -> int:
+    """Device pixels imageSizes asks for at this viewport width and density."""
+    css_width = viewport if viewport <= MOBILE_BREAKPOINT else min(viewport / 2, COLUMN_MAX_WIDTH)
+    return math.ceil(css_width * density)
 
-    print("$ " + " ".join(manager_command))
-    manager = run(manager_command, check=False)
-    print(manager.stdout.rstrip())
-    return resize.returncode == 0 and manager.returncode == 0
+
+def loaded_image(image: str, variants: dict, meta: dict) -> list[tuple[Path, int, int]] | None:
+    """(file, bytes, decoded pixels) the feed loads for a blog.yaml image on each of DEVICES.
+
+    Like the browser, picks the narrowest srcset candidate (resize_images.py's
+    variants map) at least as wide as the device's slot_width, else the widest;
+    without a srcset the image itself is loaded. Returns None if the image is
+    missing and raises OSError if it cannot be read.
+    """
+    path = Path(image_key(image))
+    if not path.is_file():
+        return None  # reported under Image References
+    if image in meta:
+        width, height = meta[image]["width"], meta[image]["height"]
+    else:
+        with Image.open(path) as im:  # reads the header only
+            width, height = im.size
+
+    srcset = variants.get(image) or []
+    # blog.js only writes a srcset with more than one candidate
+    candidates = sorted(srcset if len(srcset) > 1 else [{"src": image, "width": width}], key=lambda variant: variant["width"])
+    loaded = []
+    for _, viewport, density in DEVICES:
+        slot = slot_width(viewport, density)
+        chosen = next((variant for variant in candidates if variant["width"] >= slot), candidates[-1])
+        chosen_path, chosen_width = Path(image_key(chosen["src"])), chosen["width"]
+        if not chosen_path.is_file():
+            chosen_path, chosen_width = path, width
+        loaded.append((chosen_path, chosen_path.stat().st_size, chosen_width * round(height * chosen_width / width)))
+    return loaded
+
+
+def check_page_weight(blog: BlogYaml, image_budget: int, batch_budget: int) -> bool:
+    """Bytes and decoded pixels per feed batch on each of DEVICES.
+
+    Fails if the first batch is over batch_budget on any device, or if a feed
+    image cannot be read. Images over image_budget and later batches over
+    batch_budget are only reported.
+    """
+    variants = resize_images.load_json(resize_images.VARIANTS_MAP)
+    meta = resize_images.load_json(resize_images.IMAGE_META)
+    entries = feed_order(blog)
+    print(f"Feed: {len(entries)} entries, newest first, {ITEMS_PER_BATCH} per batch; "
+          f"{'srcset variants' if variants else 'no variants map, full images'}")
+    print("Devices: " + ", ".join(
+        f"{name} {viewport}px @{density}x ({slot_width(viewport, density)}px slot)" for name, viewport, density in DEVICES
+    ))
+    print(f"Budgets: {image_budget / 1024:.0f} KB per image, {batch_budget / 1024:.0f} KB per batch")
+
+    ok = True
+    for start in range(0, len(entries), ITEMS_PER_BATCH):
+        batch_bytes = [0] * len(DEVICES)
+        batch_pixels = [0] * len(DEVICES)
+        problems = []
+        for entry in entries[start:start + ITEMS_PER_BATCH]:
+            image = entry.get("image", "").strip()
+            if not image or image.endswith("/"):
+                continue
+            try:
+                loaded = loaded_image(image, variants, meta)
+            except (OSError, Image.DecompressionBombError) as error:
+                problems.append(f"{entry.get('title', '')}: cannot read {image}: {error}")
+                ok = False
+                continue
+            if loaded is None:
+                continue
+            for device, (path, size, pixels) in enumerate(loaded):
+                batch_bytes[device] += size
+                batch_pixels[device] += pixels
+            path, size, _ = max(loaded, key=lambda load: load[1])
+            if size > image_budget:
+                problems.append(f"{entry.get('title', '')}: {path.name} {size / 1024:.0f} KB")
+
+        number = start // ITEMS_PER_BATCH + 1
+        over = [DEVICES[device][0] for device, size in enumerate(batch_bytes) if size > batch_budget]
+        print(
+            f"  Batch {number} (entries {start + 1}-{min(start + ITEMS_PER_BATCH, len(entries))}): "
+            + ", ".join(
+                f"{name} {size / 1024:.0f} KB / {pixels / 1e6:.1f} MP"
+                for (name, _, _), size, pixels in zip(DEVICES, batch_bytes, batch_pixels)
+            )
+            + (f"  OVER BUDGET by {(max(batch_bytes) - batch_budget) / 1024:.0f} KB ({', '.join(over)})" if over else "")
+        )
+        for problem in problems:
+            print(f"    - {problem}")
+        if over and number == 1:
+            ok = False
+            print("    The first screen is over budget.")
+    return ok
+
+
+def run_image_tools(apply: bool, blog: BlogYaml, catalog: ImageCatalog) -> bool:
+    """Run resize_images and manage_blog_images in this process.
+
+    Both share blog; the manager also gets catalog, listed again first if
+    resize_images may have written files. Images the manager renames get
+    their variants and metadata rebuilt by a second, scoped resize_images run.
+    """
+    resize_args = [] if apply else ["--dry-run"]
+    print("$ " + " ".join(["python3", "resize_images.py", *resize_args]))
+    resize = resize_images.run(resize_images.parse_args(resize_args), blog)
+    sys.stdout.flush()
+    if apply and (resize.converted or resize.resized or resize.optimized):
+        catalog = ImageCatalog(catalog.directory)
+
+    plan = str(IMAGE_PLAN.relative_to(REPO_ROOT))
+    if not apply:
+        manager_args = ["--plan-out", plan]
+    elif IMAGE_PLAN.exists():
+        # Apply what the dry run reported, without analysing everything again
+        manager_args = ["--apply-plan", plan]
+    else:
+        manager_args = ["--apply"]
+
+    print("$ " + " ".join(["python3", "manage_blog_images.py", *manager_args]))
+    manager = manage_blog_images.run(manage_blog_images.parse_args(manager_args), blog, catalog)
+    if manager_args[0] == "--apply-plan" and manager["problems"]:
+        # Only what the dry run showed is applied; a new plan needs a new review
+        print("The image renames and deletes were not applied. Run blog_cleanup.py without --apply")
+        print("to review the new plan, then run it with --apply again.")
+    if apply:
+        # Carried out or out of date: either way a plan is good for one apply
+        IMAGE_PLAN.unlink(missing_ok=True)
+    renamed = [rename["yaml_update"]["new"] for rename in manager.get("renames", [])]
+    if apply and renamed:
+        # resize_images ran before the renames: build the variants and
+        # metadata under the new names and drop the old ones
+        refresh_args = ["--only", *renamed]
+        print()
+        print("$ " + " ".join(["python3", "resize_images.py", *refresh_args]))
+        refresh = resize_images.run(resize_images.parse_args(refresh_args), blog)
+        return resize.exit_code == 0 and manager["exit_code"] == 0 and refresh.exit_code == 0
+    return resize.exit_code == 0 and manager["exit_code"] == 0
+
+
+def compile_sources(sources: list[str]) -> bool:
+    """py_compile each source in this process, printing errors as python3 -m py_compile does."""
+    ok = True
+    for source in sources:
+        try:
+            py_compile.compile(str(REPO_ROOT / source), doraise=True)
+        except py_compile.PyCompileError as e:
+            print(e.msg)
+            ok = False
+    return ok
 
 
 def run_final_checks() -> bool:
-    checks = [
-        ["python3", "-m", "py_compile", "blog_cleanup.py", "manage_blog_images.py", "resize_images.py"],
-        ["git", "diff", "--check"],
+    sources = [
+        "blog_cleanup.py", "blog_yaml.py", "common.py", "manage_blog_images.py", "resize_images.py",
+        "validate_content.py",
     ]
-    ok = True
-    for command in checks:
+    print("$ " + " ".join(["python3", "-m", "py_compile", *sources]))
+    ok = compile_sources(sources)
+    for command in [["git", "diff", "--check"]]:
         print("$ " + " ".join(command))
         result = run(command, check=False)
         if result.stdout.strip():
@@ -196,41 +512,61 @@ def main() -> int:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("--since", required=True, help="Date for scoped blog text review, e.g. 2026-06-12")
     parser.add_argument("--apply", action="store_true", help="Apply mechanical image fixes")
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="Run the stages that only read the tree at the same time (report order is unchanged)",
+    )
+    parser.add_argument(
+        "--image-budget",
+        type=resize_images.parse_size,
+        default=IMAGE_BUDGET,
+        help=f"Bytes per feed image before it is reported, e.g. 400K (default {IMAGE_BUDGET // 1024}K)",
+    )
+    parser.add_argument(
+        "--batch-budget",
+        type=resize_images.parse_size,
+        default=BATCH_BUDGET,
+        help=f"Bytes per feed batch; the run fails if the first batch is over (default {BATCH_BUDGET // 1024}K)",
+    )
     args = parser.parse_args()
-
-    print_section("YAML")
-    yaml_ok = validate_yaml()
-
-    print_section("Scoped Blog Diff")
-    base, diff = changed_blog_diff(args.since)
-    print(f"Base before {args.since}: {base or '(none)'}")
-    if diff.strip():
-        print(diff.rstrip())
-        text_lines = added_text_lines(diff)
-        if text_lines:
-            print()
-            print("Review these added/changed prose lines for spelling and grammar:")
-            for line in text_lines[:40]:
-                print(f"  {line.strip()}")
-    else:
-        print("No committed content/blog.yaml changes found in the scoped range.")
-
-    print_section("Image References")
-    image_ok = validate_images()
-
-    print_section("Image Tools")
-    tools_ok = run_image_tools(args.apply)
-
-    print_section("Final Checks")
-    final_ok = run_final_checks()
+    # The image tools work with paths relative to the repository root
+    os.chdir(REPO_ROOT)
+
+    # One parse of blog.yaml and one listing of the images folder, shared
+    # by the checks and both image tools
+    blog = BlogYaml.load(BLOG_YAML)
+    catalog = ImageCatalog(manage_blog_images.IMAGES_DIR)
+
+    # --apply changes images and blog.yaml: from there on, one stage at a time
+    stages = [
+        Stage("YAML", validate_yaml),
+        Stage("Scoped Blog Diff", lambda: review_blog_diff(args.since)),
+        Stage("Image References", lambda: validate_images(blog, catalog)),
+        Stage("Image Tools", lambda: run_image_tools(args.apply, blog, catalog), parallel=not args.apply),
+        Stage(
+            "Page Weight",
+            lambda: check_page_weight(blog, args.image_budget, args.batch_budget),
+            parallel=not args.apply,
+        ),
+        Stage("Final Checks", run_final_checks, parallel=not args.apply),
+    ]
+    start = time.perf_counter()
+    run_stages(stages, args.parallel)
+    seconds = time.perf_counter() - start
 
     print_section("Result")
     if args.apply:
         print("Apply mode completed. Review git diff before committing.")
     else:
         print("Dry run completed. Re-run with --apply to apply mechanical image fixes.")
+    print()
+    print(f"Stage wall time ({'parallel' if args.parallel else 'sequential'}):")
+    for stage in stages:
+        print(f"  {stage.title:<20} {stage.seconds:6.2f}s{'' if stage.ok else '  FAILED'}")
+    print(f"  {'Total':<20} {seconds:6.2f}s")
 
-    return 0 if yaml_ok and image_ok and tools_ok and final_ok else 1
+    return 0 if all(stage.ok for stage in stages) else 1
 
 
 if __name__ == "__main__":
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Model of content/blog.yaml that remembers where everything is.
+
+blog.yaml is a list of flat entries ("- title: ...", then "  date:",
+"  image:", "  link:", "  content: |" ...). BlogYaml records each entry's
+line and character span and the span of every field value, indexes the
+entries by image path and title, and applies edits by replacing exactly
+those spans: comments, blank lines, quoting and block scalars are kept byte
+for byte, and all queued edits are written with one atomic write.
+
+diff_entries() compares two versions entry by entry (matched on date and
+title), so a moved or reordered entry is not reported as an edit.
+
+Also home of parse_dutch_date, the reading of entry dates. Shared by
+manage_blog_images.py, resize_images.py, blog_cleanup.py and
+validate_content.py.
+"""
+from __future__ import annotations
+
+import re
+from bisect import bisect_left
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+from common import write_atomic
+
+DUTCH_MONTHS = {
+    "januari": "01",
+    "februari": "02",
+    "maart": "03",
+    "april": "04",
+    "mei": "05",
+    "juni": "06",
+    "juli": "07",
+    "augustus": "08",
+    "september": "09",
+    "oktober": "10",
+    "november": "11",
+    "december": "12",
+}
+# Short forms seen in older entries ("8 en 15 nov. 2009")
+DUTCH_MONTH_ABBREVIATIONS = {
+    "jan": "01",
+    "feb": "02",
+    "mrt": "03",
+    "apr": "04",
+    "jun": "06",
+    "jul": "07",
+    "aug": "08",
+    "sep": "09",
+    "sept": "09",
+    "okt": "10",
+    "nov": "11",
+    "dec": "12",
+}
+
+# "- key: value" starts an entry, "  key: value" continues it; deeper lines
+# (block scalar text) and comments are not fields
+FIELD_LINE = re.compile(r"^(- |  )([A-Za-z_][\w-]*):[ \t]*(.*?)[ \t]*\r?$")
+
+
+@dataclass
+class Field:
+    """A field's raw value (as written, trimmed) and where it is in the text."""
+
+    name: str
+    value: str
+    line: int  # 1-based
+    start: int  # character offsets of value in the text
+    end: int
+    text_end: int = 0  # end of the value's continuation lines (block scalar text)
+
+    def __post_init__(self) -> None:
+        self.text_end = self.text_end or self.end
+
+
+@dataclass
+class Entry(Mapping):
+    """One list item; reads like a dict of field name -> raw value."""
+
+    index: int
+    line: int  # first line, 1-based
+    start: int  # character span of the entry, up to the next entry
+    end: int = 0
+    fields: dict[str, Field] = field(default_factory=dict)
+
+    def __getitem__(self, name: str) -> str:
+        return self.fields[name].value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.fields)
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+
+def parse_dutch_date(date_str: str) -> str | None:
+    """Parse Dutch date string like '14 september 2025' to YYYYMMDD format."""
+    # Handle dates like "17, 18 mei 2024", "3,4,5 juni 2022" or
+    # "8 en 15 nov. 2009" - take the first day
+    parts = date_str.split()
+
+    if len(parts) >= 3:
+        year = parts[-1]
+        # Validate year is a 4-digit number
+        if not (year.isdigit() and len(year) == 4):
+            return None
+        month_name = parts[-2].lower()
+        month = DUTCH_MONTHS.get(month_name) or DUTCH_MONTH_ABBREVIATIONS.get(month_name.rstrip("."))
+        if not month:
+            return None
+        first_part = parts[0].split(",")[0]
+        if not first_part.isdigit():
+            return None
+        day = first_part.zfill(2)
+        return f"{year}{month}{day}"
+    return None
+
+
+def unquote_yaml(value: str) -> tuple[str, str]:
+    """A one-line raw value without its YAML quotes, and the quote used ("" if none)."""
+    value = value.strip()
+    quote_char = value[:1]
+    if quote_char in ("'", '"') and len(value) > 1 and value.endswith(quote_char):
+        inner = value[1:-1]
+        if quote_char == "'":
+            return inner.replace("''", "'"), quote_char
+        return inner.replace('\\"', '"').replace("\\\\", "\\"), quote_char
+    return value, ""
+
+
+def quote_yaml(value: str, quote_char: str) -> str:
+    """value in quote_char quotes (as unquote_yaml reads them), or as is."""
+    if quote_char == "'":
+        return "'" + value.replace("'", "''") + "'"
+    if quote_char == '"':
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return value
+
+
+def image_key(value: str) -> str:
+    """Lookup key of an image path: unquoted and URL-decoded, as the file is named on disk."""
+    return unquote(unquote_yaml(value)[0])
+
+
+class BlogYaml:
+    """Entries of a blog.yaml text, with O(1) lookup and span-based edits."""
+
+    def __init__(self, text: str, path: Path | None = None):
+        self.path = path
+        self.text = text
+        self.entries: list[Entry] = []
+        self.by_image: dict[str, list[Entry]] = {}
+        # Keyed by the title as shown, without its YAML quotes
+        self.by_title: dict[str, list[Entry]] = {}
+        self.edits: dict[int, tuple[int, str]] = {}  # start -> (end, replacement)
+        self.parse()
+
+    @classmethod
+    def load(cls, path: Path) -> BlogYaml:
+        return cls(path.read_text(encoding="utf-8"), path)
+
+    def parse(self) -> None:
+        self.entries = []
+        offset = 0
+        current: Field | None = None  # field that deeper indented lines continue
+        for number, line in enumerate(self.text.splitlines(keepends=True), 1):
+            match = FIELD_LINE.match(line)
+            if match and (match.group(1) == "- " or self.entries):
+                if match.group(1) == "- ":
+                    if self.entries:
+                        self.entries[-1].end = offset
+                    self.entries.append(Entry(len(self.entries), number, offset))
+                current = Field(match.group(2), match.group(3), number, offset + match.start(3), offset + match.end(3))
+                # The first occurrence of a field wins, as in a YAML mapping
+                self.entries[-1].fields.setdefault(match.group(2), current)
+            elif line.strip():
+                if current and line.startswith("   "):
+                    current.text_end = offset + len(line.rstrip())
+                else:
+                    current = None
+            offset += len(line)
+        if self.entries:
+            self.entries[-1].end = len(self.text)
+
+        self.by_image = {}
+        self.by_title = {}
+        for entry in self.entries:
+            if "image" in entry:
+                self.by_image.setdefault(image_key(entry["image"]), []).append(entry)
+            if "title" in entry:
+                self.by_title.setdefault(unquote_yaml(entry["title"])[0], []).append(entry)
+
+    def with_image(self, path: str) -> list[Entry]:
+        """Entries whose image is path (plain or URL-encoded)."""
+        return self.by_image.get(image_key(path), [])
+
+    def value_lines(self, entry: Entry, name: str) -> list[str]:
+        """A field's value as lines: its first line (unless a block indicator)
+        and its continuation lines, dedented. Missing fields give []."""
+        if name not in entry:
+            return []
+        target = entry.fields[name]
+        first, *rest = self.text[target.start:target.text_end].split("\n")
+        rest = [line.rstrip() for line in rest]
+        indent = min((len(line) - len(line.lstrip()) for line in rest if line), default=0)
+        lines = [] if not first or first[0] in "|>" else [first]
+        return lines + [line[indent:] for line in rest]
+
+    def set_value(self, entry: Entry, name: str, value: str) -> None:
+        """Queue replacing the raw value of an existing field."""
+        target = entry.fields[name]
+        self.edits[target.start] = (target.end, value)
+
+    def replace_image(self, old: str, new: str) -> int:
+        """Queue pointing every entry whose image is old at new.
+
+        Only whole values match, so a path that is a prefix of another is
+        never touched. URL-encoded values stay URL-encoded and quoted values
+        keep their quotes. Returns the number of entries changed.
+        """
+        entries = self.with_image(old)
+        for entry in entries:
+            raw, quote_char = unquote_yaml(entry["image"])
+            value = quote(new, safe="/:") if raw != unquote(raw) else new
+            self.set_value(entry, "image", quote_yaml(value, quote_char))
+        return len(entries)
+
+    def render(self) -> str:
+        """The text with all queued edits applied."""
+        parts = []
+        position = 0
+        for start in sorted(self.edits):
+            end, value = self.edits[start]
+            parts.append(self.text[position:start])
+            parts.append(value)
+            position = end
+        parts.append(self.text[position:])
+        return "".join(parts)
+
+    def save(self) -> bool:
+        """Write the queued edits in one atomic write; False if nothing changed.
+
+        The model is re-parsed so its positions match the new text.
+        """
+        text = self.render()
+        self.edits = {}
+        if text == self.text:
+            return False
+        write_atomic(self.path, text)
+        self.text = text
+        self.parse()
+        return True
+
+
+@dataclass
+class EntryDiff:
+    """Entries added, removed and changed between two versions of blog.yaml."""
+
+    added: list[Entry] = field(default_factory=list)  # entries of the new version
+    removed: list[Entry] = field(default_factory=list)  # entries of the old version
+    changed: list[tuple[Entry, Entry, list[str]]] = field(default_factory=list)  # (old, new, changed fields)
+    moved: int = 0  # unchanged or changed entries that are in a different order
+
+
+# How entries of two versions are paired, in order: date and title, then
+# (for an edited title or date) title, image or content alone
+MATCH_KEYS = (("date", "title"), ("title",), ("image",), ("content",))
+
+
+def diff_entries(old: BlogYaml, new: BlogYaml) -> EntryDiff:
+    """Pair the entries of old and new and compare the pairs field by field."""
+    pairs: dict[int, int] = {}  # new index -> old index
+    unmatched_old = set(range(len(old.entries)))
+    for names in MATCH_KEYS:
+        candidates: dict[tuple, list[int]] = {}
+        for entry in old.entries:
+            if entry.index in unmatched_old:
+                key = tuple(tuple(old.value_lines(entry, name)) for name in names)
+                if all(key):
+                    candidates.setdefault(key, []).append(entry.index)
+        for entry in new.entries:
+            if entry.index in pairs:
+                continue
+            key = tuple(tuple(new.value_lines(entry, name)) for name in names)
+            if all(key) and candidates.get(key):
+                pairs[entry.index] = candidates[key].pop(0)
+                unmatched_old.discard(pairs[entry.index])
+
+    diff = EntryDiff()
+    for entry in new.entries:
+        if entry.index not in pairs:
+            diff.added.append(entry)
+            continue
+        before = old.entries[pairs[entry.index]]
+        names = list(entry) + [name for name in before if name not in entry]
+        changed = [name for name in names if old.value_lines(before, name) != new.value_lines(entry, name)]
+        if changed:
+            diff.changed.append((before, entry, changed))
+    diff.removed = [entry for entry in old.entries if entry.index in unmatched_old]
+
+    # Entries outside a longest run that kept its order have moved
+    order = [pairs[index] for index in sorted(pairs)]
+    run: list[int] = []
+    for index in order:
+        position = bisect_left(run, index)
+        run[position:position + 1] = [index]
+    diff.moved = len(order) - len(run)
+    return diff
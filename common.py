@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the image tools, blog_yaml.py and blog_cleanup.py.
+
+write_atomic() is how every generated or edited file is replaced (the
+manifest, the hash cache, blog.yaml); pool_context() is how the image tools
+start their worker processes.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+from pathlib import Path
+
+
+def write_atomic(path: Path, data: bytes | str) -> None:
+    """Replace a file's contents atomically (write a temp file, then rename).
+
+    Text is written as UTF-8, byte for byte (no newline translation).
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def pool_context() -> multiprocessing.context.BaseContext:
+    """Start method for worker processes: forkserver, or spawn where it is missing.
+
+    Never fork: blog_cleanup.py --parallel runs the image tools from a
+    thread, and a child forked while another thread holds a lock (stdout,
+    the import lock) can hang on it forever.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
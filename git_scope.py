@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Limit the image tools to files touched in a commit range.
+
+Shared by resize_images.py and manage_blog_images.py for their --only and
+--changed-since options. GitObjects reads files at other revisions for
+blog_cleanup.py.
+"""
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+
+
+def git_output(args: list[str], cwd: Path) -> str:
+    """Run a git command and return its output; raises ValueError on failure."""
+    result = subprocess.run(
+        ["git", *args],
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise ValueError(f"git {' '.join(args)}: {result.stderr.strip()}")
+    return result.stdout
+
+
+def changed_files(ref: str, cwd: Path | None = None) -> set[Path]:
+    """Existing files changed since ref: committed, uncommitted and untracked."""
+    cwd = cwd or Path.cwd()
+    top = Path(git_output(["rev-parse", "--show-toplevel"], cwd).strip())
+    names = git_output(["diff", "--name-only", "-z", ref, "--"], top).split("\0")
+    names += git_output(["ls-files", "--others", "--exclude-standard", "-z"], top).split("\0")
+    return {(top / name).resolve() for name in names if name and (top / name).is_file()}
+
+
+def resolve_scope(only: list[str] | None, changed_since: str | None) -> set[Path] | None:
+    """Resolved paths to limit work to, or None for a full run.
+
+    Raises ValueError for an unknown ref.
+    """
+    if not only and not changed_since:
+        return None
+    scope = {Path(path).resolve() for path in only or []}
+    if changed_since:
+        scope |= changed_files(changed_since)
+    return scope
+
+
+def in_scope(path: Path, scope: set[Path] | None) -> bool:
+    return scope is None or path.resolve() in scope
+
+
+class GitObjects:
+    """Files at any revision, read through one `git cat-file --batch` process.
+
+    Use as a context manager; every read() is a request to the same process,
+    so reading many revisions starts no further git processes.
+    """
+
+    def __init__(self, cwd: Path):
+        self.process = subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def read(self, rev: str, path: str) -> bytes | None:
+        """Contents of path at rev, or None if either does not exist.
+
+        Raises ValueError if git stopped (for example outside a repository).
+        """
+        try:
+            self.process.stdin.write(f"{rev}:{path}\n".encode())
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            raise ValueError("git cat-file --batch is not running") from None
+        header = self.process.stdout.readline().split()
+        if not header:
+            raise ValueError("git cat-file --batch is not running")
+        # "<sha> <type> <size>", or "<name> missing" / "<name> ambiguous"
+        if len(header) != 3:
+            return None
+        data = self.process.stdout.read(int(header[2]))
+        self.process.stdout.read(1)  # newline after the contents
+        return data if header[1] == b"blob" else None
+
+    def close(self) -> None:
+        self.process.stdin.close()
+        self.process.wait()
+        self.process.stdout.close()
+
+    def __enter__(self) -> GitObjects:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -7,20 +7,82 @@ This script reads blog.yaml and automatically:
 2. Renames image files to follow the convention
 3. Updates blog.yaml with the new paths
 4. Finds and cleans up duplicate files (MD5 exact matches)
-5. Lists unused images not referenced in blog.yaml
+5. Lists unused images not referenced anywhere on the site, and references
+   to images that do not exist
 6. Detects visual duplicates using perceptual hashing
 
+The images folder is listed once (ImageCatalog); every step looks files up in
+that listing, and renames and deletes keep it current.
+
+MD5 and perceptual hashes are cached in content/.image-hashes.json, keyed by
+path with size and mtime (a changed mtime with the same MD5 still hits), so a
+run over unchanged images decodes none of them. Cache misses are hashed in
+parallel: MD5 in threads, perceptual hashes in worker processes.
+
+Each image is decoded once into a small thumbnail (FINGERPRINT_PX) and every
+hash in FINGERPRINT_HASHES (or --hashes) is computed from it. Visual
+duplicates are found by pHash; with --match combined a pair must also be close
+on the mean distance over all hashes, which drops pHash-only lookalikes.
+
+--index fingerprints every image under INDEX_ROOTS (content/images,
+content/images_oud, assets) through the same cache and reports groups of
+duplicates that span more than one folder, with the bytes that removing all
+but one copy would reclaim. The copy kept is the one blog.yaml shows, else
+one in content/images, else the largest; a source next to its converted
+.webp is not counted as a copy. Nothing is changed in this mode.
+
+An image counts as used when any file in REFERENCE_SOURCES names it: the HTML
+pages, CSS, scripts, the YAML content, the review data and the Typepad export.
+They are tokenized once into a ReferenceIndex (filename -> referrers), which
+answers the unused, missing and --who-uses questions by lookup. Missing
+images named only by ARCHIVE_SOURCES (the Typepad export and the review
+data) are counted, not listed; with --only / --changed-since only references
+made by the files in scope are listed.
+
+--plan-out records the renames and exact-duplicate deletes of a dry run, with
+the size, mtime and MD5 of every file they touch.
+--apply-plan checks those preconditions (a file whose size and mtime match is
+not hashed again, and of blog.yaml only the entries being renamed) and
+carries the plan out without hashing anything for the renames and deletes;
+if anything changed it applies nothing. It then runs Step 4 as --apply does,
+so visual duplicates can still be deleted interactively.
+
+Other scripts can call run(parse_args([...]), blog, catalog) in-process with
+their own BlogYaml and ImageCatalog; it prints the same report and returns
+what it found.
+
 Usage:
     python manage_blog_images.py           # Dry run (show what would be changed)
     python manage_blog_images.py --apply   # Actually apply the changes
+    python manage_blog_images.py --plan-out plan.json     # Dry run, save the plan
+    python manage_blog_images.py --apply-plan plan.json   # Apply exactly that plan
+    python manage_blog_images.py --changed-since HEAD~1   # Only check changed files
+    python manage_blog_images.py --only content/images/x.webp
+    python manage_blog_images.py --jobs 4   # Hash with 4 workers (default: CPU count)
+    python manage_blog_images.py --match combined   # Visual duplicates must agree on all hashes
+    python manage_blog_images.py --index    # Report copies across all INDEX_ROOTS folders
+    python manage_blog_images.py --who-uses bg.webp   # List the files referencing an image
+
+With --only / --changed-since, renames and the unused check are limited to the
+given files (unless blog.yaml itself changed), and visual duplicates are only
+reported for groups that contain one of them.
 """
 
+import os
 import re
 import sys
+import json
+import argparse
 import hashlib
-from pathlib import Path
+import itertools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
 from urllib.parse import unquote
 
+from blog_yaml import BlogYaml, parse_dutch_date
+from common import pool_context, write_atomic
+from git_scope import in_scope, resolve_scope
+
 # Try to import imagehash for visual duplicate detection
 try:
     import imagehash
@@ -33,23 +95,55 @@ except ImportError:
 SCRIPT_DIR = Path(__file__).parent
 IMAGES_DIR = SCRIPT_DIR / 'content' / 'images'
 YAML_PATH = SCRIPT_DIR / 'content' / 'blog.yaml'
+HASH_CACHE_PATH = SCRIPT_DIR / 'content' / '.image-hashes.json'
+# Folders searched by --index for copies of the same image
+INDEX_ROOTS = [
+    IMAGES_DIR,
+    SCRIPT_DIR / 'content' / 'images_oud',
+    SCRIPT_DIR / 'assets',
+]
+# Narrower copies generated by resize_images.py, similar by design
+INDEX_EXCLUDE = {IMAGES_DIR / 'variants'}
+# Files whose image references make an image "used" (globs from SCRIPT_DIR)
+REFERENCE_SOURCES = [
+    '*.html',
+    'assets/css/*.css',
+    'assets/js/*.js',
+    'content/*.yaml',
+    'content/typepad_export_cleaned.txt',
+    'review-old/*.html',
+    'review-old/*.css',
+    'review-old/*.js',
+    'review-old/*.json',
+]
+# Archived copies of the old blog: their references keep images in use, but
+# the images they name that no longer exist are history, not broken links
+ARCHIVE_SOURCES = [
+    'content/typepad_export_cleaned.txt',
+    'review-old/*',
+]
+HASH_CACHE_VERSION = 2
+# Format of the --plan-out file
+PLAN_VERSION = 2
+# Exact duplicates: bytes hashed from each end before a full hash is needed
+PARTIAL_HASH_BYTES = 64 * 1024
 
-# Dutch month names to numbers
-DUTCH_MONTHS = {
-    'januari': '01',
-    'februari': '02',
-    'maart': '03',
-    'april': '04',
-    'mei': '05',
-    'juni': '06',
-    'juli': '07',
-    'augustus': '08',
-    'september': '09',
-    'oktober': '10',
-    'november': '11',
-    'december': '12'
+# Visual fingerprints: every hash is computed from one thumbnail of this size
+FINGERPRINT_PX = 128
+# Hashes stored per image (phash is always included: it drives the index)
+FINGERPRINT_HASHES = ['phash', 'dhash', 'colorhash']
+# Fingerprint names -> imagehash functions
+HASH_FUNCTIONS = {
+    'phash': 'phash',
+    'dhash': 'dhash',
+    'ahash': 'average_hash',
+    'whash': 'whash',
+    'colorhash': 'colorhash',
 }
 
+# Image extensions handled by this script, in order of preference
+IMAGE_EXTENSIONS = ['.webp', '.jpg', '.jpeg', '.png']
+
 # Regex pattern for correctly named files: YYYYMMDD_name.ext
 CORRECT_NAME_PATTERN = re.compile(r'^\d{8}_[a-z0-9_]+\.(webp|jpg|jpeg|png)$')
 
@@ -61,29 +155,233 @@ def get_file_hash(filepath):
     """Calculate MD5 hash of a file."""
     hash_md5 = hashlib.md5()
     with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
+        # Large reads: hashlib releases the GIL per chunk, so threads overlap
+        for chunk in iter(lambda: f.read(1 << 20), b""):
             hash_md5.update(chunk)
     return hash_md5.hexdigest()
 
-def parse_dutch_date(date_str):
-    """Parse Dutch date string like '14 september 2025' to YYYYMMDD format."""
-    # Handle dates like "17, 18 mei 2024" or "3, 4, 5 juni 2022" - take the first day
-    parts = date_str.split()
-    
-    if len(parts) >= 3:
-        year = parts[-1]
-        # Validate year is a 4-digit number
-        if not (year.isdigit() and len(year) == 4):
-            return None
-        month = DUTCH_MONTHS.get(parts[-2].lower())
-        if not month:
-            return None
-        first_part = parts[0].rstrip(',')
-        if not first_part.isdigit():
-            return None
-        day = first_part.zfill(2)
-        return f"{year}{month}{day}"
-    return None
+def get_partial_hash(filepath):
+    """MD5 of the first and last PARTIAL_HASH_BYTES of a file (all of a small file)."""
+    hash_md5 = hashlib.md5()
+    with open(filepath, "rb") as f:
+        hash_md5.update(f.read(PARTIAL_HASH_BYTES))
+        size = os.fstat(f.fileno()).st_size
+        if size > PARTIAL_HASH_BYTES:
+            f.seek(max(PARTIAL_HASH_BYTES, size - PARTIAL_HASH_BYTES))
+            hash_md5.update(f.read())
+    return hash_md5.hexdigest()
+
+def compute_fingerprint(filepath, names):
+    """(error, {hash name: hex}) of an image. Runs in a worker process with --jobs.
+
+    The image is decoded and downsampled once (JPEGs at reduced DCT scale)
+    and every hash is computed from that thumbnail.
+    """
+    try:
+        with Image.open(filepath) as img:
+            img.draft('RGB', (FINGERPRINT_PX, FINGERPRINT_PX))
+            thumb = img.convert('RGB')
+        thumb.thumbnail((FINGERPRINT_PX, FINGERPRINT_PX), Image.Resampling.LANCZOS)
+        return None, {name: str(getattr(imagehash, HASH_FUNCTIONS[name])(thumb)) for name in names}
+    except Exception as e:
+        return e, None
+
+class ImageCatalog:
+    """Image files of a directory, listed with one os.scandir pass.
+
+    Files are indexed by name (with the stat result from the scan) and by
+    stem. rename() and remove() apply the change on disk and to the index,
+    so later steps see the current state without listing or stat-ing the
+    directory again.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.stats = {}  # name -> os.stat_result, in directory order
+        self.by_stem = {}  # stem -> {extension: name}
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_file() and Path(entry.name).suffix.lower() in IMAGE_EXTENSIONS:
+                    self.add(entry.name, entry.stat())
+
+    def add(self, name, st):
+        self.stats[name] = st
+        stem = Path(name)
+        self.by_stem.setdefault(stem.stem, {})[stem.suffix] = name
+
+    def discard(self, name):
+        del self.stats[name]
+        stem = Path(name)
+        names = self.by_stem[stem.stem]
+        del names[stem.suffix]
+        if not names:
+            del self.by_stem[stem.stem]
+
+    def paths(self):
+        return [self.directory / name for name in self.stats]
+
+    def exists(self, path):
+        return path.parent == self.directory and path.name in self.stats
+
+    def stat(self, path):
+        """Stat result from the scan; other paths are stat-ed on disk."""
+        if self.exists(path):
+            return self.stats[path.name]
+        return path.stat()
+
+    def size(self, path):
+        return self.stat(path).st_size
+
+    def with_stem(self, stem):
+        """Paths of the files named stem + one of IMAGE_EXTENSIONS, in that order."""
+        names = self.by_stem.get(stem, {})
+        return [self.directory / names[ext] for ext in IMAGE_EXTENSIONS if ext in names]
+
+    def rename(self, old_path, new_path):
+        old_path.rename(new_path)
+        st = self.stats[old_path.name]
+        self.discard(old_path.name)
+        self.add(new_path.name, st)
+
+    def remove(self, path):
+        path.unlink()
+        self.discard(path.name)
+
+class HashCache:
+    """MD5 and perceptual hashes of image files, persisted between runs.
+
+    Entries are keyed by path relative to SCRIPT_DIR and hold size, mtime_ns,
+    md5 and (once computed) the fingerprint hashes by name. An entry is reused
+    when size and mtime match; when only the mtime moved (e.g. after a fresh
+    checkout) the MD5 is recomputed and a match keeps the cached hashes. With
+    path=None nothing is read or written. Misses are hashed with up to jobs
+    workers.
+    """
+
+    def __init__(self, path=HASH_CACHE_PATH, jobs=1, stat=None):
+        self.path = path
+        self.jobs = jobs
+        self.stat = stat or Path.stat  # an ImageCatalog.stat saves a syscall per file
+        self.decoded = 0  # images opened for a fingerprint this run
+        try:
+            data = json.loads(path.read_text(encoding='utf-8')) if path else {}
+        except (OSError, ValueError):
+            data = {}
+        self.entries = data.get('files', {}) if data.get('version') == HASH_CACHE_VERSION else {}
+        self.changed = False
+
+    def key(self, filepath):
+        try:
+            return filepath.resolve().relative_to(SCRIPT_DIR.resolve()).as_posix()
+        except ValueError:
+            return filepath.resolve().as_posix()
+
+    def is_current(self, filepath):
+        entry = self.entries.get(self.key(filepath))
+        st = self.stat(filepath)
+        return bool(entry) and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns
+
+    def entry(self, filepath, md5=None):
+        """Cache entry for a file, refreshed (or reset) to match the file on disk.
+
+        md5 can be passed when it was already computed.
+        """
+        key = self.key(filepath)
+        st = self.stat(filepath)
+        entry = self.entries.get(key)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry
+        md5 = md5 or get_file_hash(filepath)
+        if not (entry and entry['size'] == st.st_size and entry['md5'] == md5):
+            entry = {'size': st.st_size, 'md5': md5}
+        entry['mtime_ns'] = st.st_mtime_ns
+        self.entries[key] = entry
+        self.changed = True
+        return entry
+
+    def md5(self, filepath):
+        return self.entry(filepath)['md5']
+
+    def thread_map(self, fn, items):
+        """Ordered map of fn over items, in a thread pool when jobs > 1."""
+        if self.jobs > 1 and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                return list(pool.map(fn, items))
+        return [fn(item) for item in items]
+
+    def prefetch_md5(self, filepaths):
+        """Hash the files whose entries are out of date, in a thread pool."""
+        def safe_md5(filepath):
+            try:
+                return get_file_hash(filepath)
+            except OSError:
+                return None  # raised again (and reported) by the caller's entry() call
+
+        todo = []
+        for filepath in filepaths:
+            try:
+                if not self.is_current(filepath):
+                    todo.append(filepath)
+            except OSError:
+                pass
+        for filepath, md5 in zip(todo, self.thread_map(safe_md5, todo)):
+            if md5:
+                self.entry(filepath, md5)
+
+    def fingerprints(self, filepaths, names):
+        """{hash name: hex} per file, in order; the exception for a file that failed.
+
+        Only files missing one of the named hashes are decoded, in a process
+        pool with jobs > 1.
+        """
+        self.prefetch_md5(filepaths)
+        results = []
+        missing = []  # (position, filepath)
+        for filepath in filepaths:
+            try:
+                entry = self.entry(filepath)
+            except Exception as e:
+                results.append(e)
+                continue
+            if not all(name in entry.get('hashes', {}) for name in names):
+                missing.append((len(results), filepath))
+            results.append(entry)
+
+        # pool.map keeps the input order, so output is the same for any --jobs
+        paths = [filepath for _, filepath in missing]
+        if self.jobs > 1 and len(missing) > 1:
+            with ProcessPoolExecutor(max_workers=self.jobs, mp_context=pool_context()) as pool:
+                computed = list(pool.map(compute_fingerprint, paths, [names] * len(paths)))
+        else:
+            computed = [compute_fingerprint(filepath, names) for filepath in paths]
+
+        for (position, _), (error, hashes) in zip(missing, computed):
+            if error:
+                results[position] = error
+                continue
+            results[position].setdefault('hashes', {}).update(hashes)
+            self.decoded += 1
+            self.changed = True
+
+        return [
+            result if isinstance(result, Exception) else {name: result['hashes'][name] for name in names}
+            for result in results
+        ]
+
+    def save(self):
+        """Drop entries of files that no longer exist and write the cache if it changed."""
+        if not self.path:
+            return
+        for key in list(self.entries):
+            path = Path(key) if Path(key).is_absolute() else SCRIPT_DIR / key
+            if not path.is_file():
+                del self.entries[key]
+                self.changed = True
+        if not self.changed:
+            return
+        text = json.dumps({'version': HASH_CACHE_VERSION, 'files': self.entries}, indent=1, sort_keys=True)
+        write_atomic(self.path, text + '\n')
+        self.changed = False
 
 def title_to_filename(title):
     """Convert title to a filename-friendly format."""
@@ -95,27 +393,25 @@ def title_to_filename(title):
     title = title.strip('_')
     return title
 
+def blog_entries(blog):
+    """The entries of a BlogYaml that have a title."""
+    return [entry for entry in blog.entries if 'title' in entry]
+
+def used_image_names(entries):
+    """File names of the images the entries show."""
+    used_filenames = set()
+    for entry in entries:
+        image = entry.get('image', '')
+        if image and image != 'content/images/':
+            used_filenames.add(unquote(image.split('/')[-1]))
+    return used_filenames
+
 def parse_blog_yaml(yaml_path):
-    """Parse blog.yaml and extract entries with title, date, and image."""
-    entries = []
-    current_entry = {}
-    
-    with open(yaml_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.startswith('- title:'):
-                if current_entry and 'title' in current_entry:
-                    entries.append(current_entry)
-                current_entry = {'title': line.split(':', 1)[1].strip()}
-            elif line.strip().startswith('date:') and 'title' in current_entry:
-                current_entry['date'] = line.split(':', 1)[1].strip()
-            elif line.strip().startswith('image:') and not line.strip().startswith('#') and 'title' in current_entry:
-                image_path = line.split(':', 1)[1].strip()
-                current_entry['image'] = image_path
-    
-    if current_entry and 'title' in current_entry:
-        entries.append(current_entry)
-    
-    return entries
+    """Parse blog.yaml and extract entries with title, date, and image.
+
+    Entries are blog_yaml.Entry objects, read like dicts of raw field values.
+    """
+    return blog_entries(BlogYaml.load(Path(yaml_path)))
 
 def get_expected_filename(title, date):
     """Generate the expected filename based on title and date."""
@@ -134,40 +430,178 @@ def is_correctly_named(current_image, expected_filename):
     current_filename = unquote(current_image.split('/')[-1])
     return current_filename == expected_filename
 
-def find_duplicates_to_delete(images_dir):
-    """Find duplicate files that don't follow the naming convention."""
-    # Build hash map of all correctly named files
-    correct_files = {}  # hash -> filepath
+def exact_duplicate_groups(files, cache, size):
+    """Groups of byte-identical files (each a list, in input order).
+
+    Files are only hashed as far as needed: sizes first, then the first and
+    last PARTIAL_HASH_BYTES of same-sized files, and a full MD5 only for
+    files that still collide. size(path) gives a file's size.
+    """
+    # Stage 1: only files of the same size can be identical
+    by_size = {}
+    for f in files:
+        by_size.setdefault(size(f), []).append(f)
+    candidates = [f for group in by_size.values() if len(group) > 1 for f in group]
+
+    # Stage 2: both ends of the file
+    partial = dict(zip(candidates, cache.thread_map(get_partial_hash, candidates)))
+    by_partial = {}
+    for f in candidates:
+        by_partial.setdefault((size(f), partial[f]), []).append(f)
+    colliding = [f for group in by_partial.values() if len(group) > 1 for f in group]
+
+    # Stage 3: full MD5, unless stage 2 already read the whole file
+    full = [f for f in colliding if size(f) > 2 * PARTIAL_HASH_BYTES]
+    cache.prefetch_md5(full)
+
     all_files = {}  # hash -> [filepaths]
-    
-    for f in images_dir.iterdir():
-        if f.is_file() and f.suffix.lower() in ['.webp', '.jpg', '.jpeg', '.png']:
-            file_hash = get_file_hash(f)
-            
-            if file_hash not in all_files:
-                all_files[file_hash] = []
-            all_files[file_hash].append(f)
-            
-            if CORRECT_NAME_PATTERN.match(f.name):
-                correct_files[file_hash] = f
+    for f in colliding:
+        file_hash = cache.md5(f) if f in full else (size(f), partial[f])
+        all_files.setdefault(file_hash, []).append(f)
+    return [group for group in all_files.values() if len(group) > 1]
+
+def find_duplicates_to_delete(images_dir, cache=None, protected=frozenset(), catalog=None):
+    """Find duplicate files that don't follow the naming convention.
+
+    Filenames in protected (the ones blog.yaml uses) are never marked for
+    deletion.
+    """
+    catalog = catalog or ImageCatalog(images_dir)
+    cache = cache or HashCache(None, stat=catalog.stat)
     
     # Find duplicates to delete
     to_delete = []
-    for file_hash, files in all_files.items():
-        if len(files) > 1 and file_hash in correct_files:
-            # Keep the correctly named one, mark others for deletion
-            correct_file = correct_files[file_hash]
-            for f in files:
-                if f != correct_file:
-                    to_delete.append((f, correct_file))
+    for files in exact_duplicate_groups(sorted(catalog.paths()), cache, catalog.size):
+        correct = [f for f in files if CORRECT_NAME_PATTERN.match(f.name)]
+        if not correct:
+            continue
+        # Keep the correctly named one, mark others for deletion
+        correct_file = correct[-1]
+        for f in files:
+            if f != correct_file and f.name not in protected:
+                to_delete.append((f, correct_file))
     
     return to_delete
 
 # Site assets that are used elsewhere (not in blog.yaml) - exclude from unused check
 IGNORED_FILES = {'anyway.jpg', 'bg.jpg', 'bg.webp', 'overlay.webp', '.DS_Store'}
 
-def find_unused_images(images_dir, entries):
-    """Find images that are not referenced in blog.yaml."""
+# An image path in a source line: a quoted string or url(...), a YAML or
+# Typepad "key: value" ending in an image, or a bare token (srcset, prose)
+_IMAGE_EXT = r'\.(?:jpe?g|png|webp|gif|bmp|tiff?)'
+IMAGE_REFERENCE_PATTERN = re.compile(
+    r'''["'(]([^"'()<>]*?''' + _IMAGE_EXT + r''')(?:[?#][^"'()<>]*)?["')]'''
+    r'''|^[\s-]*[\w ]+:\s+([^"'\s][^"']*?''' + _IMAGE_EXT + r''')\s*$'''
+    r'''|([^\s"'()<>?#=,]+''' + _IMAGE_EXT + r''')\b''',
+    re.IGNORECASE,
+)
+# Typepad asset id; the export names one size of an asset, the local copy
+# may be another size or carry a descriptive prefix
+TYPEPAD_ASSET_PATTERN = re.compile(r'6a[0-9a-f]{32}')
+
+class ReferenceIndex:
+    """Image filename -> the source lines that reference it.
+
+    Built in one pass over REFERENCE_SOURCES. Lookups go by filename (the
+    images folders are flat and pages link across them), by stem for the
+    source .jpg kept beside a used .webp, and by Typepad asset id.
+    """
+
+    def __init__(self, root=SCRIPT_DIR, sources=REFERENCE_SOURCES):
+        self.root = root
+        self.by_name = {}  # filename -> ["path:line", ...]
+        self.by_stem = {}  # stem -> ["path:line", ...]
+        self.by_asset = {}  # Typepad asset id -> ["path:line", ...]
+        self.sources = sorted({f for pattern in sources for f in root.glob(pattern) if f.is_file()})
+        for source in self.sources:
+            self.scan(source)
+
+    def scan(self, source):
+        skip_comments = source.suffix.lower() in ('.yaml', '.yml')
+        name = source.relative_to(self.root).as_posix()
+        with open(source, encoding='utf-8', errors='replace') as f:
+            for number, line in enumerate(f, 1):
+                if skip_comments and line.lstrip().startswith('#'):
+                    continue
+                for match in IMAGE_REFERENCE_PATTERN.finditer(line):
+                    self.add(next(filter(None, match.groups())), f"{name}:{number}")
+
+    def add(self, reference, referrer):
+        filename = unquote(reference.rsplit('/', 1)[-1]).strip()
+        if not filename:
+            return
+        self.by_name.setdefault(filename, []).append(referrer)
+        self.by_stem.setdefault(Path(filename).stem, []).append(referrer)
+        asset = TYPEPAD_ASSET_PATTERN.search(filename)
+        if asset:
+            self.by_asset.setdefault(asset.group(), []).append(referrer)
+
+    def who_uses(self, filename):
+        """Referrers of filename, directly or through its Typepad asset id."""
+        referrers = list(self.by_name.get(filename, []))
+        asset = TYPEPAD_ASSET_PATTERN.search(filename)
+        if asset:
+            referrers += [r for r in self.by_asset.get(asset.group(), []) if r not in referrers]
+        return referrers
+
+    def is_used(self, path):
+        if path.name in self.by_name:
+            return True
+        # Don't report .jpg as unused if the .webp version is being used
+        # (common pattern: keep source .jpg alongside optimized .webp)
+        if path.suffix.lower() in ['.jpg', '.jpeg'] and path.stem in self.by_stem:
+            return True
+        asset = TYPEPAD_ASSET_PATTERN.search(path.name)
+        return bool(asset) and asset.group() in self.by_asset
+
+    def missing(self, filenames):
+        """{filename: referrers} for references to none of filenames."""
+        assets = {m.group() for name in filenames for m in [TYPEPAD_ASSET_PATTERN.search(name)] if m}
+        missing = {}
+        for filename, referrers in self.by_name.items():
+            if filename in filenames:
+                continue
+            asset = TYPEPAD_ASSET_PATTERN.search(filename)
+            if asset and asset.group() in assets:
+                continue
+            missing[filename] = referrers
+        return dict(sorted(missing.items()))
+
+def referrer_path(referrer):
+    """The source file of a "path:line" referrer, relative to the index root."""
+    return referrer.rsplit(':', 1)[0]
+
+def is_archived(referrer):
+    return any(PurePosixPath(referrer_path(referrer)).match(pattern) for pattern in ARCHIVE_SOURCES)
+
+def missing_references(references, filenames, scope=None):
+    """Missing images named by the live site, and how many only the archive names.
+
+    Returns ({filename: referrers}, archived count). With a scope, only
+    references made by files in the scope are listed.
+    """
+    missing = {}
+    archived = 0
+    for filename, referrers in references.missing(filenames).items():
+        live = [r for r in referrers if not is_archived(r)]
+        if not live:
+            archived += 1
+            continue
+        live = [r for r in live if in_scope(references.root / referrer_path(r), scope)]
+        if live:
+            missing[filename] = live
+    return missing, archived
+
+def find_unused_images(images_dir, entries, catalog=None, references=None):
+    """Find images that are not referenced in blog.yaml.
+
+    With a ReferenceIndex, references from any of its sources count instead.
+    """
+    catalog = catalog or ImageCatalog(images_dir)
+    if references is not None:
+        unused = [f for f in catalog.paths() if f.name not in IGNORED_FILES and not references.is_used(f)]
+        return sorted(unused, key=lambda x: x.name)
+
     # Get all image filenames used in blog.yaml
     used_filenames = set()
     used_stems = set()
@@ -183,11 +617,7 @@ def find_unused_images(images_dir, entries):
     
     # Get all image files in the directory
     unused = []
-    for f in images_dir.iterdir():
-        if not f.is_file():
-            continue
-        if f.suffix.lower() not in ['.webp', '.jpg', '.jpeg', '.png']:
-            continue
+    for f in catalog.paths():
         if f.name in IGNORED_FILES:
             continue
         
@@ -208,36 +638,72 @@ def find_unused_images(images_dir, entries):
 # (perceptual hashes differ by at most this many bits)
 HASH_DISTANCE_THRESHOLD = 8
 
-def find_visual_duplicates(images_dir):
-    """Find visually similar images using perceptual hashing with hamming distance.
-    
-    Uses hamming distance to find near-matches, catching images that are
-    similar but not byte-identical (e.g., recompressed or resized versions).
+# --match combined: mean over all fingerprint hashes of the distance as a
+# fraction of the hash's bits (8 of 64 bits is the pHash threshold above)
+COMBINED_DISTANCE_THRESHOLD = HASH_DISTANCE_THRESHOLD / 64
+
+# Number of substrings each hash is split into for the near-duplicate index
+HASH_INDEX_CHUNKS = 4
+
+def hash_to_int(image_hash):
+    """Pack an ImageHash into an int, so hamming distance is a popcount."""
+    return int(str(image_hash), 16)
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+class HashIndex:
+    """Multi-index hashing: find all stored hashes within a hamming radius.
+
+    Each hash is split into HASH_INDEX_CHUNKS substrings, each with its own
+    lookup table. Two hashes within the radius differ in at most
+    radius // chunks bits of at least one substring (pigeonhole), so a query
+    only looks up keys that close to its own substrings and compares the full
+    hash of those candidates. Results are exact, not approximate.
+    """
+
+    def __init__(self, bits, radius, chunks=HASH_INDEX_CHUNKS):
+        self.radius = radius
+        width = -(-bits // chunks)
+        self.spans = [(shift, min(width, bits - shift)) for shift in range(0, bits, width)]
+        sub_radius = radius // len(self.spans)
+        # All flip patterns of at most sub_radius bits, per substring width
+        self.flips = {}
+        for _, span_width in self.spans:
+            self.flips[span_width] = [
+                sum(1 << bit for bit in bits_set)
+                for r in range(sub_radius + 1)
+                for bits_set in itertools.combinations(range(span_width), r)
+            ]
+        self.tables = [{} for _ in self.spans]
+        self.values = []
+
+    def add(self, value):
+        """Store a hash; returns its position."""
+        index = len(self.values)
+        self.values.append(value)
+        for table, (shift, width) in zip(self.tables, self.spans):
+            table.setdefault((value >> shift) & ((1 << width) - 1), []).append(index)
+        return index
+
+    def search(self, value):
+        """Positions of all stored hashes within the radius of value."""
+        candidates = set()
+        for table, (shift, width) in zip(self.tables, self.spans):
+            key = (value >> shift) & ((1 << width) - 1)
+            for flip in self.flips[width]:
+                candidates.update(table.get(key ^ flip, ()))
+        return [i for i in candidates if hamming(self.values[i], value) <= self.radius]
+
+def group_similar(hashes, bits, scoped=None, accept=None):
+    """Cluster integer hashes within HASH_DISTANCE_THRESHOLD of each other.
+
+    Returns lists of positions. With scoped (a bool per hash), only pairs
+    involving a scoped hash are linked; accept(i, j) can veto a pair.
     """
-    if not IMAGEHASH_AVAILABLE:
-        return []
-    
-    # Calculate perceptual hash for each image
-    image_hashes = []  # list of (hash, filepath)
-    
-    for f in images_dir.iterdir():
-        if not f.is_file():
-            continue
-        if f.suffix.lower() not in ['.webp', '.jpg', '.jpeg', '.png']:
-            continue
-        if f.name in IGNORED_FILES:
-            continue
-        
-        try:
-            with Image.open(f) as img:
-                phash = imagehash.phash(img)
-                image_hashes.append((phash, f))
-        except Exception as e:
-            print(f"  WARNING: Could not process {f.name}: {e}")
-    
     # Group images by similar hashes using hamming distance
     # Use Union-Find to cluster similar images
-    n = len(image_hashes)
+    n = len(hashes)
     parent = list(range(n))
     
     def find(x):
@@ -250,26 +716,205 @@ def find_visual_duplicates(images_dir):
         if px != py:
             parent[px] = py
     
-    # Compare all pairs and union if similar
-    for i in range(n):
-        for j in range(i + 1, n):
-            hash_i, _ = image_hashes[i]
-            hash_j, _ = image_hashes[j]
-            distance = hash_i - hash_j  # imagehash returns hamming distance
-            if distance <= HASH_DISTANCE_THRESHOLD:
+    index = HashIndex(bits, HASH_DISTANCE_THRESHOLD)
+    for value in hashes:
+        index.add(value)
+
+    # Each hash only looks up its near neighbours instead of comparing all pairs
+    for i, value in enumerate(hashes):
+        if scoped is not None and not scoped[i]:
+            continue
+        for j in index.search(value):
+            if j != i and (accept is None or accept(i, j)):
                 union(i, j)
     
     # Collect groups
     groups = {}
     for i in range(n):
-        root = find(i)
-        if root not in groups:
-            groups[root] = []
-        groups[root].append(image_hashes[i][1])
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+def fingerprint_names(hashes):
+    """Hash names to compute: phash first (it drives the index), then the rest."""
+    return ['phash'] + [name for name in hashes if name != 'phash']
+
+def group_fingerprints(fingerprints, scoped=None, match='phash'):
+    """Cluster fingerprints ({hash name: hex}) into lists of positions.
+
+    Neighbours come from the pHash index; with match='combined' they must
+    also be within COMBINED_DISTANCE_THRESHOLD over all hashes.
+    """
+    if not fingerprints:
+        return []
+    names = list(fingerprints[0])
+    values = [{name: int(h, 16) for name, h in fp.items()} for fp in fingerprints]
+    bits = {name: len(h) * 4 for name, h in fingerprints[0].items()}
+
+    accept = None
+    if match == 'combined':
+        def accept(i, j):
+            distance = sum(hamming(values[i][name], values[j][name]) / bits[name] for name in names)
+            return distance / len(names) <= COMBINED_DISTANCE_THRESHOLD
+
+    return group_similar([value['phash'] for value in values], bits['phash'], scoped, accept)
+
+def scan_images(root):
+    """(path, stat) of every image under root, skipping INDEX_EXCLUDE.
+
+    One os.scandir per folder; sorted by path.
+    """
+    found = []
+    folders = [root]
+    while folders:
+        folder = folders.pop()
+        if folder in INDEX_EXCLUDE or not folder.is_dir():
+            continue
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    folders.append(Path(entry.path))
+                elif entry.is_file() and Path(entry.name).suffix.lower() in IMAGE_EXTENSIONS:
+                    found.append((Path(entry.path), entry.stat()))
+    return sorted(found)
+
+def relative_name(path):
+    try:
+        return path.relative_to(SCRIPT_DIR).as_posix()
+    except ValueError:
+        return str(path)
+
+def run_who_uses(names):
+    """--who-uses: print the files that reference each image."""
+    references = ReferenceIndex()
+    for name in names:
+        filename = Path(unquote(name)).name
+        referrers = references.who_uses(filename)
+        if not referrers:
+            print(f"{filename}: not referenced in {len(references.sources)} source file(s)")
+            continue
+        print(f"{filename}: {len(referrers)} reference(s)")
+        for referrer in referrers:
+            print(f"  {referrer}")
+    return 0
+
+def order_index_group(files, stats, root_of, shown):
+    """A group of duplicates with the copy to keep first, or None if no group is left.
+
+    A source next to its converted .webp is the same image by design, not a
+    copy to reclaim, so it is left out. The copy to keep is the one blog.yaml
+    shows, then one in the primary folder (INDEX_ROOTS[0]), then the largest.
+    """
+    converted = {f.with_suffix('') for f in files if f.suffix.lower() == '.webp'}
+    files = [f for f in files if f.suffix.lower() == '.webp' or f.with_suffix('') not in converted]
+    if len(files) < 2 or len({root_of[f] for f in files}) < 2:
+        return None
+    return sorted(files, key=lambda f: (f not in shown, root_of[f] != INDEX_ROOTS[0], -stats[f].st_size))
+
+def run_index(args, scope):
+    """--index: report duplicates that span more than one of INDEX_ROOTS."""
+    print("=" * 70)
+    print("DUPLICATE INDEX ACROSS FOLDERS (report only)")
+    print("=" * 70 + "\n")
+
+    stats = {}
+    root_of = {}
+    counts = []
+    for root in INDEX_ROOTS:
+        found = scan_images(root)
+        counts.append(f"{relative_name(root)} ({len(found)})")
+        for path, st in found:
+            stats[path] = st
+            root_of[path] = root
+    print(f"Indexed {len(stats)} image(s): {', '.join(counts)}\n")
+
+    if not IMAGEHASH_AVAILABLE:
+        print("Install 'imagehash' and 'Pillow' for the duplicate index.\n")
+        print("  pip install imagehash Pillow\n")
+        return 0
+
+    def stat(path):
+        return stats.get(path) or path.stat()
+
+    cache = HashCache(jobs=args.jobs, stat=stat)
+    paths = list(stats)
+    fingerprinted = []  # (fingerprint, path)
+    for path, fingerprint in zip(paths, cache.fingerprints(paths, fingerprint_names(args.hashes))):
+        if isinstance(fingerprint, Exception):
+            print(f"  WARNING: Could not process {relative_name(path)}: {fingerprint}")
+        else:
+            fingerprinted.append((fingerprint, path))
+
+    shown = {IMAGES_DIR / name for name in used_image_names(blog_entries(BlogYaml.load(YAML_PATH)))}
+    groups = []
+    for positions in group_fingerprints([fp for fp, _ in fingerprinted], match=args.match):
+        files = order_index_group([fingerprinted[i][1] for i in positions], stats, root_of, shown)
+        if files and any(in_scope(f, scope) for f in files):
+            groups.append(files)
+
+    total = 0
+    if not groups:
+        print("No duplicates across folders.\n")
+    else:
+        print(f"Found {len(groups)} group(s) of duplicates across folders:\n")
+        for i, files in enumerate(groups, 1):
+            # Keep the first copy; same bytes as it are marked with =
+            reclaimable = sum(stats[f].st_size for f in files[1:])
+            total += reclaimable
+            kept_md5 = cache.md5(files[0])
+            print(f"  Group {i} (reclaimable {reclaimable / 1024:.1f} KB):")
+            for f in files:
+                same = "=" if f != files[0] and cache.md5(f) == kept_md5 else " "
+                print(f"    {same} {relative_name(f)} ({stats[f].st_size / 1024:.1f} KB)")
+            print()
+        print("Legend: the first file of each group is kept (shown in blog.yaml, else in "
+              f"{relative_name(INDEX_ROOTS[0])}, else the largest), = marks the same bytes as it\n")
+
+    cache.save()
+    print(f"Fingerprints: {cache.decoded} computed, the rest from {HASH_CACHE_PATH.name}")
+    print(f"Reclaimable across folders: {total / 1024:.1f} KB in {len(groups)} group(s)")
+    return 0
+
+def find_visual_duplicates(images_dir, scope=None, cache=None, catalog=None,
+                           hashes=FINGERPRINT_HASHES, match='phash'):
+    """Find visually similar images using perceptual hashing with hamming distance.
+    
+    Uses hamming distance to find near-matches, catching images that are
+    similar but not byte-identical (e.g., recompressed or resized versions).
+    With a scope (set of resolved paths), only pairs involving a file in the
+    scope are compared and only groups containing one are returned.
+    Hashes come from cache (a HashCache) when given. With match='combined',
+    pHash neighbours must also be within COMBINED_DISTANCE_THRESHOLD over
+    all of hashes.
+    """
+    if not IMAGEHASH_AVAILABLE:
+        return []
+    catalog = catalog or ImageCatalog(images_dir)
+    cache = cache or HashCache(None, stat=catalog.stat)
+    
+    names = fingerprint_names(hashes)
+
+    # Calculate the fingerprint hashes for each image
+    image_hashes = []  # list of ({name: hex}, filepath)
+    
+    files = [f for f in catalog.paths() if f.name not in IGNORED_FILES]
+    for f, fingerprint in zip(files, cache.fingerprints(files, names)):
+        if isinstance(fingerprint, Exception):
+            print(f"  WARNING: Could not process {f.name}: {fingerprint}")
+        else:
+            image_hashes.append((fingerprint, f))
     
+    groups = group_fingerprints(
+        [fingerprint for fingerprint, _ in image_hashes],
+        None if scope is None else [in_scope(f, scope) for _, f in image_hashes],
+        match,
+    )
+
     # Filter: only groups with multiple files and different stems
     duplicates = []
-    for files in groups.values():
+    for positions in groups:
+        files = [image_hashes[i][1] for i in positions]
+        if not any(in_scope(f, scope) for f in files):
+            continue
         if len(files) > 1:
             stems = set(f.stem for f in files)
             if len(stems) > 1:  # Different filenames = true duplicates
@@ -277,8 +922,333 @@ def find_visual_duplicates(images_dir):
     
     return duplicates
 
-def main():
-    dry_run = '--apply' not in sys.argv
+def review_visual_duplicates(args, scope, cache, catalog, used_filenames, dry_run):
+    """Step 4: report groups of visually similar images and, when applying
+    interactively, offer to delete the files outside the naming convention.
+
+    Returns the groups.
+    """
+    visual_duplicates = []
+    if not IMAGEHASH_AVAILABLE:
+        print("Install 'imagehash' and 'Pillow' for visual duplicate detection.\n")
+        print("  pip install imagehash Pillow\n")
+    else:
+        # Current catalog (no exclusions needed - MD5 duplicates already deleted)
+        visual_duplicates = find_visual_duplicates(IMAGES_DIR, scope, cache, catalog, args.hashes, args.match)
+        print(f"Fingerprints: {cache.decoded} computed, the rest from {HASH_CACHE_PATH.name}\n")
+
+        if not visual_duplicates:
+            print("No visual duplicates found.\n")
+        else:
+            print(f"Found {len(visual_duplicates)} group(s) of visually similar images:\n")
+
+            for i, group in enumerate(visual_duplicates, 1):
+                compliant = [f for f in group if follows_naming_convention(f.name)]
+                non_compliant = [f for f in group if not follows_naming_convention(f.name)]
+
+                print(f"  Group {i}:")
+                for img in group:
+                    size_kb = catalog.size(img) / 1024
+                    convention_mark = "✓" if follows_naming_convention(img.name) else "✗"
+                    in_yaml = "📄" if img.name in used_filenames else "  "
+                    print(f"    [{convention_mark}] {in_yaml} {img.name} ({size_kb:.1f} KB)")
+
+                if compliant and non_compliant:
+                    if dry_run:
+                        print(f"    (Can delete {len(non_compliant)} non-compliant file(s) with --apply)")
+                    elif not sys.stdin.isatty():
+                        print("    (Skipping delete prompt in non-interactive mode)")
+                    else:
+                        answer = input(f"  Delete {len(non_compliant)} non-compliant file(s)? [Y/n]: ").strip().lower()
+                        if answer != 'n':
+                            for dup in non_compliant:
+                                try:
+                                    catalog.remove(dup)
+                                    print(f"    DELETED: {dup.name}")
+                                except Exception as e:
+                                    print(f"    ERROR: {dup.name}: {e}")
+                        else:
+                            print("    → Skipped")
+                else:
+                    print("    (No clear compliant/non-compliant split)")
+                print()
+
+            print("Legend: [✓] follows naming convention, [✗] doesn't, 📄 = used in blog.yaml\n")
+
+    return visual_duplicates
+
+def apply_renames(renames, catalog, blog=None):
+    """Rename files and their siblings, then point blog.yaml at the new names.
+
+    blog (a BlogYaml of YAML_PATH) is updated in place when given.
+    """
+    print(f"Renaming {len(renames)} file(s)...")
+    successful_yaml_updates = []
+    
+    for rename_info in renames:
+        old_path = rename_info['old']
+        new_path = rename_info['new']
+        siblings = rename_info['siblings']
+        yaml_update = rename_info['yaml_update']
+        
+        try:
+            if catalog.exists(new_path):
+                print(f"  SKIP (target exists): {new_path.name}")
+                continue
+            catalog.rename(old_path, new_path)
+            print(f"  RENAMED: {old_path.name} -> {new_path.name}")
+            successful_yaml_updates.append(yaml_update)
+            
+            # Rename sibling files
+            for sib_old, sib_new in siblings:
+                try:
+                    if catalog.exists(sib_new):
+                        print(f"    SKIP sibling (target exists): {sib_new.name}")
+                    else:
+                        catalog.rename(sib_old, sib_new)
+                        print(f"    RENAMED sibling: {sib_old.name} -> {sib_new.name}")
+                except Exception as e:
+                    print(f"    ERROR sibling: {sib_old.name}: {e}")
+        except Exception as e:
+            print(f"  ERROR: {old_path.name}: {e}")
+    
+    # Update blog.yaml: only the image values of the matching entries, in
+    # one write
+    if successful_yaml_updates:
+        print("\nUpdating blog.yaml...")
+        blog = blog or BlogYaml.load(YAML_PATH)
+        for update in successful_yaml_updates:
+            if blog.replace_image(update['old'], update['new']):
+                print(f"  UPDATED: {update['old']} -> {update['new']}")
+        blog.save()
+    
+    print()
+
+def delete_duplicates(duplicates, catalog):
+    """Delete exact duplicates ((duplicate, kept file) pairs)."""
+    print(f"Deleting {len(duplicates)} duplicate file(s)...")
+    for dup, correct in duplicates:
+        try:
+            catalog.remove(dup)
+            print(f"  DELETED: {dup.name} (duplicate of {correct.name})")
+        except Exception as e:
+            print(f"  ERROR deleting {dup.name}: {e}")
+    print()
+
+def plan_file(path, cache):
+    """Precondition for a file the plan touches: its size, mtime and MD5."""
+    st = cache.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'md5': cache.md5(path)}
+
+def file_matches(path, expected):
+    """Whether path still holds the bytes recorded in the plan.
+
+    Size and mtime are enough when both match; only a file whose mtime moved
+    is hashed again.
+    """
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return False
+    if st.st_size != expected['size']:
+        return False
+    return st.st_mtime_ns == expected['mtime_ns'] or get_file_hash(path) == expected['md5']
+
+def write_plan(path, renames, duplicates, cache):
+    """Write the renames and deletes of a dry run to path (JSON).
+
+    Deletes are recorded under the names the files will have once the
+    renames are done.
+    """
+    moved = {}
+    for rename in renames:
+        moved[rename['old']] = rename['new']
+        moved.update(rename['siblings'])
+    files = {}
+    for rename in renames:
+        for old, _ in [(rename['old'], rename['new'])] + rename['siblings']:
+            files[relative_name(old)] = plan_file(old, cache)
+    for dup, correct in duplicates:
+        for f in (dup, correct):
+            files[relative_name(moved.get(f, f))] = plan_file(f, cache)
+    plan = {
+        'version': PLAN_VERSION,
+        'renames': [
+            {
+                'old': relative_name(rename['old']),
+                'new': relative_name(rename['new']),
+                'siblings': [[relative_name(old), relative_name(new)] for old, new in rename['siblings']],
+                'yaml_update': rename['yaml_update'],
+            }
+            for rename in renames
+        ],
+        'deletes': [
+            {'path': relative_name(moved.get(dup, dup)), 'keeps': relative_name(moved.get(correct, correct))}
+            for dup, correct in duplicates
+        ],
+        'files': files,
+    }
+    path.write_text(json.dumps(plan, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
+
+def check_plan(plan, blog):
+    """Problems that keep the plan from applying as reviewed (empty if none).
+
+    Only the blog.yaml entries the plan points elsewhere are checked, so
+    other edits (such as resize_images.py pointing a converted image at its
+    .webp) do not invalidate it unless they touch those entries.
+    """
+    if plan.get('version') != PLAN_VERSION:
+        return [f"plan version {plan.get('version')} is not {PLAN_VERSION}"]
+    files = plan['files']
+    problems = []
+    planned_new = set()
+    for rename in plan['renames']:
+        if not blog.with_image(rename['yaml_update']['old']):
+            problems.append(f"{relative_name(YAML_PATH)} no longer shows {rename['yaml_update']['old']}")
+        planned_old = {rename['old']} | {old for old, _ in rename['siblings']}
+        for old, new in [(rename['old'], rename['new'])] + rename['siblings']:
+            if not file_matches(SCRIPT_DIR / old, files[old]):
+                problems.append(f"{old} is missing or changed")
+            if (SCRIPT_DIR / new).exists():
+                problems.append(f"{new} already exists")
+            planned_new.add(new)
+        # A file of the same stem made since (a conversion) would be left behind
+        old_path = SCRIPT_DIR / rename['old']
+        for ext in IMAGE_EXTENSIONS:
+            name = relative_name(old_path.with_suffix(ext))
+            if name not in planned_old and (SCRIPT_DIR / name).exists():
+                problems.append(f"{name} appeared next to {rename['old']}")
+    for delete in plan['deletes']:
+        for name in (delete['path'], delete['keeps']):
+            # Files renamed by the plan are checked under their old name above
+            if name not in planned_new and not file_matches(SCRIPT_DIR / name, files[name]):
+                problems.append(f"{name} is missing or changed")
+    return problems
+
+def run_plan(args, blog=None, catalog=None):
+    """--apply-plan: check a plan written by --plan-out, then carry it out.
+
+    The renames and deletes come from the plan, so nothing is hashed for
+    Steps 1-3; Step 4 then runs as with --apply (fingerprints mostly come
+    from the cache), including the interactive delete prompt. Returns a dict
+    with the exit code, the problems that made a plan stale and the renames
+    and deletes carried out.
+    """
+    path = args.apply_plan
+    print("=" * 70)
+    print(f"APPLYING PLAN {path}")
+    print("=" * 70 + "\n")
+    try:
+        plan = json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError) as e:
+        print(f"ERROR: Could not read plan: {e}")
+        return {'exit_code': 2, 'problems': [str(e)]}
+    blog = blog or BlogYaml.load(YAML_PATH)
+    problems = check_plan(plan, blog)
+    if problems:
+        print(f"Plan no longer matches the files ({len(problems)} problem(s)); nothing was changed:\n")
+        for problem in problems:
+            print(f"  {problem}")
+        print("\nRun the dry run again with --plan-out to make a new plan.")
+        return {'exit_code': 1, 'problems': problems, 'renames': [], 'duplicates': []}
+
+    catalog = catalog or ImageCatalog(IMAGES_DIR)
+    renames = [
+        {
+            'old': SCRIPT_DIR / rename['old'],
+            'new': SCRIPT_DIR / rename['new'],
+            'siblings': [(SCRIPT_DIR / old, SCRIPT_DIR / new) for old, new in rename['siblings']],
+            'yaml_update': rename['yaml_update'],
+        }
+        for rename in plan['renames']
+    ]
+    duplicates = [(SCRIPT_DIR / delete['path'], SCRIPT_DIR / delete['keeps']) for delete in plan['deletes']]
+    if renames:
+        apply_renames(renames, catalog, blog)
+    if duplicates:
+        delete_duplicates(duplicates, catalog)
+    if not renames and not duplicates:
+        print("The plan has no changes.\n")
+
+    print("-" * 70)
+    print("Step 4: Checking for visual duplicates...")
+    print("-" * 70 + "\n")
+    cache = HashCache(jobs=args.jobs, stat=catalog.stat)
+    review_visual_duplicates(args, None, cache, catalog, used_image_names(blog_entries(blog)), dry_run=False)
+    cache.save()
+    print("Done!")
+    return {'exit_code': 0, 'problems': [], 'renames': renames, 'duplicates': duplicates}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Manage and organize blog images.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--apply', action='store_true', help="Actually apply the changes")
+    mode.add_argument(
+        '--plan-out', type=Path, metavar='FILE',
+        help="Dry run that also writes the renames and deletes to FILE for --apply-plan",
+    )
+    mode.add_argument(
+        '--apply-plan', type=Path, metavar='FILE',
+        help="Apply a plan from --plan-out after checking the files are unchanged, then run Step 4",
+    )
+    parser.add_argument(
+        '--jobs', '-j', type=int, default=os.cpu_count() or 1,
+        help="Hashing workers (default: CPU count, 1 = serial)",
+    )
+    parser.add_argument('--only', nargs='+', metavar='PATH', help="Only check these files")
+    parser.add_argument(
+        '--changed-since', metavar='REF',
+        help="Only check files changed since this git ref (plus uncommitted and untracked files)",
+    )
+    parser.add_argument(
+        '--hashes', type=lambda value: [name.strip() for name in value.split(',') if name.strip()],
+        default=FINGERPRINT_HASHES, metavar='NAMES',
+        help=f"Comma-separated fingerprint hashes from {', '.join(HASH_FUNCTIONS)} "
+             f"(default: {','.join(FINGERPRINT_HASHES)})",
+    )
+    parser.add_argument(
+        '--match', choices=['phash', 'combined'], default='phash',
+        help="Visual duplicates by pHash alone, or by the combined distance over all hashes",
+    )
+    parser.add_argument(
+        '--index', action='store_true',
+        help="Only report duplicates across the INDEX_ROOTS folders, with reclaimable bytes",
+    )
+    parser.add_argument(
+        '--who-uses', action='append', metavar='IMAGE',
+        help="Only list the files referencing IMAGE (a filename or path; repeatable)",
+    )
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    unknown = [name for name in args.hashes if name not in HASH_FUNCTIONS]
+    if unknown:
+        parser.error(f"unknown hash(es): {', '.join(unknown)}")
+    return args
+
+def run(args, blog=None, catalog=None):
+    """Run the steps selected by args (from parse_args), printing the report.
+
+    blog (a BlogYaml of YAML_PATH) and catalog (an ImageCatalog of
+    IMAGES_DIR) can be passed in by a caller that already has them; both are
+    kept current. Returns a dict with the exit code and what was found:
+    renames, duplicates, unused, missing and visual_duplicates.
+    """
+    dry_run = not args.apply
+    try:
+        scope = resolve_scope(args.only, args.changed_since)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return {'exit_code': 2}
+    # An edited blog.yaml can change any entry, so renames and the unused
+    # check stay global; only the visual duplicate search is narrowed then
+    entry_scope = None if scope is None or YAML_PATH.resolve() in scope else scope
+    if args.index:
+        return {'exit_code': run_index(args, scope)}
+    if args.who_uses:
+        return {'exit_code': run_who_uses(args.who_uses)}
+    if args.apply_plan:
+        return run_plan(args, blog, catalog)
     
     if dry_run:
         print("=" * 70)
@@ -289,9 +1259,16 @@ def main():
         print("APPLYING CHANGES")
         print("=" * 70 + "\n")
     
+    # One listing of the images folder, kept current by renames and deletes
+    catalog = catalog or ImageCatalog(IMAGES_DIR)
+
     # Parse blog.yaml
-    entries = parse_blog_yaml(YAML_PATH)
+    blog = blog or BlogYaml.load(YAML_PATH)
+    entries = blog_entries(blog)
     print(f"Found {len(entries)} blog entries\n")
+    if scope is not None:
+        images = [p for p in scope if p.suffix.lower() in IMAGE_EXTENSIONS and IMAGES_DIR.resolve() in p.parents]
+        print(f"Limited to {len(images)} changed image(s)\n")
     
     # =========================================================================
     # STEP 1: RENAME FILES
@@ -323,19 +1300,22 @@ def main():
         current_filename = unquote(image.split('/')[-1])
         old_path = IMAGES_DIR / current_filename
         new_path = IMAGES_DIR / expected_filename
+
+        if entry_scope is not None and not any(
+            in_scope(IMAGES_DIR / (Path(current_filename).stem + ext), entry_scope)
+            for ext in IMAGE_EXTENSIONS
+        ):
+            continue
         
         # Check if source file exists
-        if not old_path.exists():
+        if not catalog.exists(old_path):
             print(f"WARNING: File not found: {current_filename}")
             # Try to find with different extension
-            for ext in ['.webp', '.jpg', '.jpeg', '.png']:
-                alt_path = IMAGES_DIR / (Path(current_filename).stem + ext)
-                if alt_path.exists():
-                    old_path = alt_path
-                    print(f"  Found alternative: {alt_path.name}")
-                    break
-            else:
+            alternatives = catalog.with_stem(Path(current_filename).stem)
+            if not alternatives:
                 continue
+            old_path = alternatives[0]
+            print(f"  Found alternative: {old_path.name}")
         
         # Prefer an existing WebP sibling for the YAML target. This avoids
         # renaming JPEG bytes to a .webp filename when the current YAML still
@@ -344,7 +1324,7 @@ def main():
         expected_stem = new_path.stem
         if new_path.suffix.lower() == '.webp' and old_path.suffix.lower() != '.webp':
             webp_sibling = IMAGES_DIR / (current_stem + '.webp')
-            if webp_sibling.exists():
+            if catalog.exists(webp_sibling):
                 old_path = webp_sibling
 
         print(f"RENAME: {old_path.name}")
@@ -352,10 +1332,9 @@ def main():
 
         # Also find sibling files with same stem but different extensions
         sibling_renames = []
-        for ext in ['.webp', '.jpg', '.jpeg', '.png']:
-            sibling = IMAGES_DIR / (current_stem + ext)
-            if sibling.exists() and sibling != old_path:
-                new_sibling = IMAGES_DIR / (expected_stem + ext)
+        for sibling in catalog.with_stem(current_stem):
+            if sibling != old_path:
+                new_sibling = IMAGES_DIR / (expected_stem + sibling.suffix)
                 sibling_renames.append((sibling, new_sibling))
                 print(f"  ALSO: {sibling.name} → {new_sibling.name}")
         
@@ -377,76 +1356,44 @@ def main():
         print(f"Found {len(renames)} file(s) to rename.\n")
     else:
         # Apply renames immediately
-        print(f"Renaming {len(renames)} file(s)...")
-        successful_yaml_updates = []
-        
-        for rename_info in renames:
-            old_path = rename_info['old']
-            new_path = rename_info['new']
-            siblings = rename_info['siblings']
-            yaml_update = rename_info['yaml_update']
-            
-            try:
-                if new_path.exists():
-                    print(f"  SKIP (target exists): {new_path.name}")
-                    continue
-                old_path.rename(new_path)
-                print(f"  RENAMED: {old_path.name} -> {new_path.name}")
-                successful_yaml_updates.append(yaml_update)
-                
-                # Rename sibling files
-                for sib_old, sib_new in siblings:
-                    try:
-                        if sib_new.exists():
-                            print(f"    SKIP sibling (target exists): {sib_new.name}")
-                        else:
-                            sib_old.rename(sib_new)
-                            print(f"    RENAMED sibling: {sib_old.name} -> {sib_new.name}")
-                    except Exception as e:
-                        print(f"    ERROR sibling: {sib_old.name}: {e}")
-            except Exception as e:
-                print(f"  ERROR: {old_path.name}: {e}")
-        
-        # Update blog.yaml
-        if successful_yaml_updates:
-            print("\nUpdating blog.yaml...")
-            content = YAML_PATH.read_text(encoding='utf-8')
-            for update in successful_yaml_updates:
-                if update['old'] in content:
-                    content = content.replace(update['old'], update['new'])
-                    print(f"  UPDATED: {update['old']} -> {update['new']}")
-            YAML_PATH.write_text(content, encoding='utf-8')
-        
-        print()
+        apply_renames(renames, catalog, blog)
     
+    # The model was re-parsed if blog.yaml was updated
+    if not dry_run and renames:
+        entries = blog_entries(blog)
+
+    # Build set of used filenames (never deleted, and marked in Step 4)
+    used_filenames = used_image_names(entries)
+
+    # Everything else on the site that names an image (after the renames)
+    references = ReferenceIndex()
+
+    cache = HashCache(jobs=args.jobs, stat=catalog.stat)
+
     # =========================================================================
-    # STEP 2: MD5 DUPLICATES (DISABLED)
-    # Disabled - relying on Step 4 visual check which has interactive prompts
-    # and won't accidentally delete files referenced in blog.yaml
+    # STEP 2: MD5 DUPLICATES
+    # Exact copies of a correctly named file; referenced files are always
+    # kept
     # =========================================================================
-    # print("-" * 70)
-    # print("Step 2: Checking for duplicate files (exact MD5 matches)...")
-    # print("-" * 70 + "\n")
-    # 
-    # duplicates = find_duplicates_to_delete(IMAGES_DIR)
-    # 
-    # if not duplicates:
-    #     print("No duplicate files found.\n")
-    # elif dry_run:
-    #     print(f"Found {len(duplicates)} duplicate file(s) to delete:\n")
-    #     for dup, correct in duplicates:
-    #         print(f"  DELETE: {dup.name}")
-    #         print(f"   KEEPS: {correct.name}")
-    #         print()
-    # else:
-    #     print(f"Deleting {len(duplicates)} duplicate file(s)...")
-    #     for dup, correct in duplicates:
-    #         try:
-    #             dup.unlink()
-    #             print(f"  DELETED: {dup.name} (duplicate of {correct.name})")
-    #         except Exception as e:
-    #             print(f"  ERROR deleting {dup.name}: {e}")
-    #     print()
+    print("-" * 70)
+    print("Step 2: Checking for duplicate files (exact MD5 matches)...")
+    print("-" * 70 + "\n")
+    
+    duplicates = [
+        (dup, correct) for dup, correct in find_duplicates_to_delete(IMAGES_DIR, cache, used_filenames | set(references.by_name), catalog)
+        if in_scope(dup, scope) or in_scope(correct, scope)
+    ]
+    
+    if not duplicates:
+        print("No duplicate files found.\n")
+    elif dry_run:
+        print(f"Found {len(duplicates)} duplicate file(s) to delete:\n")
+        for dup, correct in duplicates:
+            print(f"  DELETE: {dup.name}")
+            print(f"   KEEPS: {correct.name}")
+            print()
+    else:
+        delete_duplicates(duplicates, catalog)
     
     # =========================================================================
     # STEP 3: CHECK UNUSED IMAGES
@@ -456,20 +1403,36 @@ def main():
     print("Step 3: Checking for unused images...")
     print("-" * 70 + "\n")
     
-    # Re-parse blog.yaml in case it was updated
-    if not dry_run and renames:
-        entries = parse_blog_yaml(YAML_PATH)
-    
-    unused_images = find_unused_images(IMAGES_DIR, entries)
+    unused_images = [
+        img for img in find_unused_images(IMAGES_DIR, entries, catalog, references)
+        if in_scope(img, entry_scope)
+    ]
     
     if unused_images:
         print(f"Found {len(unused_images)} unused image(s):\n")
         for img in unused_images:
-            size_kb = img.stat().st_size / 1024
+            size_kb = catalog.size(img) / 1024
             print(f"  {img.name} ({size_kb:.1f} KB)")
         print()
     else:
         print("No unused images found.\n")
+
+    local_names = {f.name for f in catalog.paths()}
+    for root in INDEX_ROOTS[1:]:
+        local_names.update(path.name for path, _ in scan_images(root))
+    missing, archived = missing_references(references, local_names, scope)
+    if missing:
+        print(f"Found {len(missing)} referenced image(s) that do not exist:\n")
+        for filename, referrers in missing.items():
+            more = f" (+{len(referrers) - 1} more)" if len(referrers) > 1 else ""
+            print(f"  {filename} ← {referrers[0]}{more}")
+        print()
+    elif scope is not None:
+        print("No file in scope references a missing image.\n")
+    else:
+        print("Every referenced image exists.\n")
+    if archived and scope is None:
+        print(f"({archived} more missing image(s) are only named by the archive: {', '.join(ARCHIVE_SOURCES)})\n")
     
     # =========================================================================
     # STEP 4: VISUAL DUPLICATE DETECTION
@@ -479,66 +1442,35 @@ def main():
     print("Step 4: Checking for visual duplicates...")
     print("-" * 70 + "\n")
     
-    # Build set of used filenames for display
-    used_filenames = set()
-    for entry in entries:
-        image = entry.get('image', '')
-        if image and image != 'content/images/':
-            filename = unquote(image.split('/')[-1])
-            used_filenames.add(filename)
-    
-    if not IMAGEHASH_AVAILABLE:
-        print("Install 'imagehash' and 'Pillow' for visual duplicate detection.\n")
-        print("  pip install imagehash Pillow\n")
-    else:
-        # Fresh scan of disk (no exclusions needed - MD5 duplicates already deleted)
-        visual_duplicates = find_visual_duplicates(IMAGES_DIR)
-        
-        if not visual_duplicates:
-            print("No visual duplicates found.\n")
-        else:
-            print(f"Found {len(visual_duplicates)} group(s) of visually similar images:\n")
-            
-            for i, group in enumerate(visual_duplicates, 1):
-                compliant = [f for f in group if follows_naming_convention(f.name)]
-                non_compliant = [f for f in group if not follows_naming_convention(f.name)]
-                
-                print(f"  Group {i}:")
-                for img in group:
-                    size_kb = img.stat().st_size / 1024
-                    convention_mark = "✓" if follows_naming_convention(img.name) else "✗"
-                    in_yaml = "📄" if img.name in used_filenames else "  "
-                    print(f"    [{convention_mark}] {in_yaml} {img.name} ({size_kb:.1f} KB)")
-                
-                if compliant and non_compliant:
-                    if dry_run:
-                        print(f"    (Can delete {len(non_compliant)} non-compliant file(s) with --apply)")
-                    elif not sys.stdin.isatty():
-                        print("    (Skipping delete prompt in non-interactive mode)")
-                    else:
-                        answer = input(f"  Delete {len(non_compliant)} non-compliant file(s)? [Y/n]: ").strip().lower()
-                        if answer != 'n':
-                            for dup in non_compliant:
-                                try:
-                                    dup.unlink()
-                                    print(f"    DELETED: {dup.name}")
-                                except Exception as e:
-                                    print(f"    ERROR: {dup.name}: {e}")
-                        else:
-                            print("    → Skipped")
-                else:
-                    print("    (No clear compliant/non-compliant split)")
-                print()
-            
-            print("Legend: [✓] follows naming convention, [✗] doesn't, 📄 = used in blog.yaml\n")
-    
+    visual_duplicates = review_visual_duplicates(args, scope, cache, catalog, used_filenames, dry_run)
+
+    if args.plan_out:
+        write_plan(args.plan_out, renames, duplicates, cache)
+        print(f"Plan written to {args.plan_out}: {len(renames)} rename(s), {len(duplicates)} delete(s)\n")
+
+    cache.save()
+
     # =========================================================================
     # DONE
     # =========================================================================
-    if dry_run:
+    if args.plan_out:
+        print(f"Run with --apply-plan {args.plan_out} to make these changes.")
+    elif dry_run:
         print("Run with --apply to make these changes.")
     else:
         print("Done!")
 
+    return {
+        'exit_code': 0,
+        'renames': renames,
+        'duplicates': duplicates,
+        'unused': unused_images,
+        'missing': missing,
+        'visual_duplicates': visual_duplicates,
+    }
+
+def main(argv=None):
+    return run(parse_args(argv))['exit_code']
+
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -7,6 +7,23 @@ This script:
 2. Resizes images exceeding 2048px (longest edge)
 3. Fixes EXIF orientation issues
 4. Updates blog.yaml references to point to new .webp files
+5. Writes narrower width variants of every image referenced in blog.yaml to
+   content/images/variants/<stem>-<path hash>-<width>w.webp, plus a map from each
+   blog.yaml image path to its variants (content/images.variants.json) that
+   the blog page uses for srcset
+6. Writes content/images.meta.json with the width, height, dominant colour
+   and a tiny blurred placeholder (LQIP) of every referenced image, so blog
+   cards can be laid out before the image itself has loaded
+
+With --max-kb (alias --target-kb) and/or --min-ssim the WebP quality is
+chosen per image instead of using the fixed QUALITY: the highest quality whose
+output fits the byte budget, never below the lowest quality that still meets
+the SSIM floor. The chosen quality is cached in the manifest.
+
+A manifest (content/images/.manifest.json) records size, mtime, content hash,
+dimensions and encoder settings per file, so unchanged files are skipped
+without being opened. Changing MAX_PX, QUALITY or METHOD re-converts only the
+sources whose output depends on the changed setting.
 
 Note: Original source files (.jpg, .png, etc.) are kept after conversion.
 This is intentional to preserve originals as backup. Use manage_blog_images.py
@@ -15,10 +32,71 @@ to identify and clean up unused source files after conversion.
 Usage:
     python resize_images.py
     python resize_images.py --dry-run
+    python resize_images.py --jobs 4
+    python resize_images.py --max-kb 300 --min-ssim 0.95
+    python resize_images.py --changed-since HEAD~1
+    python resize_images.py --only content/images/new_photo.jpg
+
+With --only / --changed-since only the given (or changed) files are converted
+and only their variants and placeholders are rebuilt; every other referenced
+image keeps its entry from the existing variants map and metadata sidecar.
+Variants that no image in the new map uses are removed in either case, so
+--only on a renamed image also cleans up the variants of its old name.
+
+Workers are only handed a file while the estimated decode memory of everything
+in flight fits under --max-memory (default: half the physical memory); the
+estimate comes from the image header. A file that is larger than the budget on
+its own is processed alone. Multi-page TIFFs convert their largest page by
+default (--multipage first|largest|skip), and say so in the output.
+
+--optimize-existing also revisits every .webp in content/images (including
+files that are really JPEG or PNG data under a .webp name) and replaces it
+only when a smaller version looks the same: EXIF/XMP stripped from the
+container as-is (ICC is kept), a lossless re-encode of lossless content, or a
+QUALITY re-encode whose SSIM against the current pixels is at least
+OPTIMIZE_MIN_SSIM in each of the Y, Cb and Cr channels (color_ssim; needs
+numpy). Lossless content (PNG data, lossless WebP) stays lossless unless
+--allow-lossy is given. Re-encodes must save OPTIMIZE_MIN_SAVING of
+the file, so nothing is recompressed for a few bytes. WebPs converted from a source next to them
+are only stripped, never re-encoded. Files are replaced atomically.
+
+Other scripts can call run(parse_args([...]), blog) in-process: it prints the
+same report and returns a RunSummary; a BlogYaml passed as blog is used (and
+kept current) for content/blog.yaml instead of reading the file again.
 """
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
 import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
-from PIL import Image, ImageOps
+from urllib.parse import quote, unquote
+from PIL import Image, ImageFilter, ImageOps
+
+from blog_yaml import BlogYaml
+from common import pool_context, write_atomic
+from git_scope import in_scope, resolve_scope
+
+# numpy is only needed for the --min-ssim quality floor
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# resource (peak RSS in the summary) does not exist on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
 
 INPUT_DIR = Path("content/images")
 YAML_FILES = [Path("content/blog.yaml")]
@@ -26,136 +104,1270 @@ IGNORE_FILES = {"anyway.jpg"}
 MAX_PX = 2048
 QUALITY = 85
 METHOD = 6
+# Lowest quality the --max-kb / --min-ssim search may choose
+MIN_QUALITY = 40
 # Source formats to convert to webp
 SOURCE_FORMATS = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp"}
 # Webp files to check for resizing only
 WEBP_FORMAT = {".webp"}
+MANIFEST_PATH = INPUT_DIR / ".manifest.json"
+MANIFEST_VERSION = 1
+# Responsive variants: widths generated below each image's own width
+VARIANT_WIDTHS = (320, 640, 1024)
+VARIANTS_DIR = INPUT_DIR / "variants"
+VARIANTS_MAP = INPUT_DIR.parent / "images.variants.json"
+IMAGE_META = INPUT_DIR.parent / "images.meta.json"
+LQIP_PX = 16
+MULTIPAGE_CHOICES = ("largest", "first", "skip")
+# --optimize-existing: a lossy re-encode must be at least this close to the
+# current pixels in every channel (color_ssim)
+OPTIMIZE_MIN_SSIM = 0.98
+# ... and save at least this fraction (stripping metadata only has to save a byte)
+OPTIMIZE_MIN_SAVING = 0.05
+EXIF_ORIENTATION = 0x0112
+
+
+def manifest_key(path: Path) -> str:
+    """Manifest key for a file: its path with forward slashes."""
+    return str(path).replace("\\", "/")
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_record(path: Path, digest: str | None = None) -> dict:
+    """Identity of a file as stored in the manifest."""
+    st = path.stat()
+    return {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": digest or file_digest(path),
+    }
+
+
+def is_fresh(record: dict | None, path: Path) -> bool:
+    """Check that a file still matches its manifest record.
+
+    Size and mtime are compared first; the content hash is only computed when
+    the mtime moved (e.g. after a fresh checkout), and a matching hash just
+    refreshes the stored mtime.
+    """
+    if record is None:
+        return False
+    try:
+        st = path.stat()
+    except OSError:
+        return False
+    if st.st_size != record["size"]:
+        return False
+    if st.st_mtime_ns == record["mtime_ns"]:
+        return True
+    if file_digest(path) != record["sha256"]:
+        return False
+    record["mtime_ns"] = st.st_mtime_ns
+    return True
+
+
+@dataclass(frozen=True)
+class ByteBudget:
+    """Adaptive quality settings from --max-kb and --min-ssim."""
+    max_bytes: int | None = None
+    min_ssim: float | None = None
+
+
+def encoder_settings(width: int, height: int, budget: ByteBudget | None = None) -> dict:
+    """Settings the .webp output of a width x height source depends on.
+
+    MAX_PX only matters for sources larger than it, so raising or lowering it
+    leaves smaller images untouched.
+    """
+    settings = {
+        "max_px": MAX_PX if max(width, height) > MAX_PX else None,
+        "quality": QUALITY,
+        "method": METHOD,
+    }
+    if budget is not None:
+        settings["max_bytes"] = budget.max_bytes
+        settings["min_ssim"] = budget.min_ssim
+        settings["min_quality"] = MIN_QUALITY
+    return settings
+
+
+def encode_webp(im: Image.Image, quality: int, **options) -> bytes:
+    buffer = io.BytesIO()
+    im.save(buffer, "WEBP", quality=quality, method=METHOD, **options)
+    return buffer.getvalue()
+
+
+def ssim(a: Image.Image, b: Image.Image, block: int = 8) -> float:
+    """Mean SSIM of two same-sized images over non-overlapping 8x8 luma blocks."""
+    return block_ssim(np.asarray(a.convert("L"), dtype=np.float64), np.asarray(b.convert("L"), dtype=np.float64), block)
+
+
+def color_ssim(a: Image.Image, b: Image.Image, block: int = 8) -> float:
+    """The lowest block SSIM over the Y, Cb and Cr channels (and alpha, if any).
+
+    Stricter than ssim(): damage that only shows in the colour channels
+    (bleeding or blotchy chroma) lowers the score too.
+    """
+    scores = [
+        block_ssim(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64), block)
+        for x, y in zip(a.convert("RGB").convert("YCbCr").split(), b.convert("RGB").convert("YCbCr").split())
+    ]
+    if "A" in a.getbands():
+        alpha = b.getchannel("A") if "A" in b.getbands() else Image.new("L", b.size, 255)
+        scores.append(block_ssim(np.asarray(a.getchannel("A"), dtype=np.float64), np.asarray(alpha, dtype=np.float64), block))
+    return min(scores)
+
+
+def block_ssim(x, y, block: int = 8) -> float:
+    """Mean SSIM of two same-shaped 2-D arrays over non-overlapping blocks."""
+    h, w = (x.shape[0] // block) * block, (x.shape[1] // block) * block
+    if not h or not w:
+        return 1.0 if np.array_equal(x, y) else 0.0
+    x = x[:h, :w].reshape(h // block, block, w // block, block).swapaxes(1, 2)
+    y = y[:h, :w].reshape(h // block, block, w // block, block).swapaxes(1, 2)
+    mx, my = x.mean(axis=(2, 3)), y.mean(axis=(2, 3))
+    vx, vy = x.var(axis=(2, 3)), y.var(axis=(2, 3))
+    cov = ((x - mx[..., None, None]) * (y - my[..., None, None])).mean(axis=(2, 3))
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    score = ((2 * mx * my + c1) * (2 * cov + c2)) / ((mx ** 2 + my ** 2 + c1) * (vx + vy + c2))
+    return float(score.mean())
+
+
+def choose_quality(im: Image.Image, budget: ByteBudget) -> tuple[bytes, int, int]:
+    """Binary-search the WebP quality for an image.
+
+    Returns (encoded bytes, quality, size at the fixed QUALITY). The quality
+    is the highest one whose output fits budget.max_bytes, but never below
+    the lowest one whose SSIM against the input is at least budget.min_ssim.
+    Without a byte budget that lowest SSIM-passing quality is used as is.
+    """
+    encoded = {QUALITY: encode_webp(im, QUALITY)}
+
+    def encode(quality: int) -> bytes:
+        if quality not in encoded:
+            encoded[quality] = encode_webp(im, quality)
+        return encoded[quality]
+
+    def meets_ssim(quality: int) -> bool:
+        with Image.open(io.BytesIO(encode(quality))) as decoded:
+            return ssim(im, decoded) >= budget.min_ssim
+
+    lowest = MIN_QUALITY
+    if budget.min_ssim is not None:
+        # Lowest quality meeting the floor (SSIM rises with quality)
+        lo, hi = MIN_QUALITY, QUALITY
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if meets_ssim(mid):
+                hi = mid
+            else:
+                lo = mid + 1
+        lowest = lo
+
+    quality = lowest
+    if budget.max_bytes is not None:
+        # Highest quality that fits (size rises with quality)
+        lo, hi = lowest, QUALITY
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if len(encode(mid)) <= budget.max_bytes:
+                lo = mid
+            else:
+                hi = mid - 1
+        quality = lo
+
+    return encode(quality), quality, len(encoded[QUALITY])
+
+
+def image_placeholder(im: Image.Image) -> dict:
+    """Dominant colour and a tiny blurred WebP data URI for an open image.
+
+    Images with transparency get no placeholder: it would stay visible
+    behind the transparent parts.
+    """
+    if im.mode in ("RGBA", "LA", "PA") or "transparency" in im.info:
+        return {}
+    thumb = im.convert("RGB")
+    thumb.thumbnail((LQIP_PX * 4, LQIP_PX * 4), resample=Image.Resampling.BOX)
+    palette = thumb.quantize(colors=8)
+    _, index = max(palette.getcolors())
+    r, g, b = palette.getpalette()[index * 3:index * 3 + 3]
+
+    thumb.thumbnail((LQIP_PX, LQIP_PX), resample=Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    thumb.filter(ImageFilter.GaussianBlur(1)).save(buffer, "WEBP", quality=40)
+    return {
+        "color": f"#{r:02x}{g:02x}{b:02x}",
+        "lqip": "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii"),
+    }
+
+
+def load_json(path: Path) -> dict:
+    """Load a JSON object written by write_json(); missing or invalid is empty."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def load_manifest() -> dict:
+    """Load manifest entries keyed by path; a missing or outdated manifest is empty."""
+    data = load_json(MANIFEST_PATH)
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("files", {})
 
 
-def update_yaml_references(old_path: Path, new_path: Path) -> int:
-    """Replace image references in YAML files. Returns count of replacements."""
-    replacements = 0
-    # Use forward slashes for consistent path format in YAML
-    old_str = str(old_path).replace("\\", "/")
-    new_str = str(new_path).replace("\\", "/")
-    
+def write_json(path: Path, data: dict) -> None:
+    """Write JSON atomically, and only if the contents changed."""
+    text = json.dumps(data, indent=1, sort_keys=True, ensure_ascii=False) + "\n"
+    try:
+        if path.read_text(encoding="utf-8") == text:
+            return
+    except OSError:
+        pass
+    write_atomic(path, text)
+
+
+def save_manifest(entries: dict) -> None:
+    """Write the manifest (atomically, only when changed)."""
+    write_json(MANIFEST_PATH, {"version": MANIFEST_VERSION, "files": entries})
+
+
+def load_yaml_files(blog: BlogYaml | None = None) -> list[BlogYaml]:
+    """Models of the existing YAML_FILES; blog stands in for its own file."""
+    models = []
     for yaml_file in YAML_FILES:
-        if not yaml_file.exists():
-            continue
-        
-        content = yaml_file.read_text(encoding="utf-8")
-        if old_str in content:
-            updated = content.replace(old_str, new_str)
-            yaml_file.write_text(updated, encoding="utf-8")
-            replacements += content.count(old_str)
-            print(f"  Updated {yaml_file.name}: {old_path.name} → {new_path.name}")
-    
-    return replacements
-
-
-def main() -> int:
-    dry_run = "--dry-run" in sys.argv
+        if blog is not None and blog.path is not None and blog.path.resolve() == yaml_file.resolve():
+            models.append(blog)
+        elif yaml_file.exists():
+            models.append(BlogYaml.load(yaml_file))
+    return models
+
+
+def referenced_images(models: list[BlogYaml]) -> list[str]:
+    """Image paths referenced from YAML_FILES, in file order, without duplicates."""
+    images: dict[str, None] = {}
+    for model in models:
+        for entry in model.entries:
+            image = entry.get("image", "")
+            if image and not image.startswith("#") and not image.endswith("/"):
+                images[image] = None
+    return list(images)
+
+
+def variant_path(src: Path, width: int) -> Path:
+    """Deterministic path of the width variant of src.
+
+    The variants folder is flat, so the name carries a short hash of src's
+    path: images with the same name in different folders get their own.
+    """
+    path_hash = hashlib.sha256(manifest_key(src).encode("utf-8")).hexdigest()[:8]
+    return VARIANTS_DIR / f"{src.stem}-{path_hash}-{width}w.webp"
+
+
+def variant_widths(width: int) -> list[int]:
+    """Ladder widths below an image's own width (the image itself is the largest)."""
+    return [w for w in VARIANT_WIDTHS if w < width]
+
+
+def variant_settings(source: dict) -> dict:
+    """What a variant depends on: the exact source bytes and the encoder settings."""
+    return {"source_sha256": source["sha256"], "quality": QUALITY, "method": METHOD}
+
+
+def update_yaml_references(mappings: dict[Path, Path], models: list[BlogYaml]) -> dict[Path, int]:
+    """Point image fields in YAML files at the new paths.
+
+    Entries are looked up by image path in each file's BlogYaml; only whole
+    image values are replaced (a path that is a prefix of another is left
+    alone) and each file is written atomically once. Returns the replacement
+    count per old path.
+    """
+    counts = {old_path: 0 for old_path in mappings}
+    if not mappings:
+        return counts
+
+    for blog in models:
+        file_count = 0
+        for old_path, new_path in mappings.items():
+            # Use forward slashes for consistent path format in YAML
+            count = blog.replace_image(manifest_key(old_path), manifest_key(new_path))
+            counts[old_path] += count
+            file_count += count
+        if blog.save():
+            print(f"Updated {blog.path.name}: {file_count} reference(s)")
+
+    return counts
+
+
+@dataclass
+class FileResult:
+    """Outcome of processing one file, reported back to the parent process."""
+    src: Path
+    converted: bool = False
+    resized: bool = False
+    skipped: bool = False
+    error: bool = False
+    message: str = ""
+    variants: int = 0
+    # --optimize-existing: the file was replaced by a smaller one
+    optimized: bool = False
+    original_bytes: int = 0
+    saved_bytes: int = 0
+    # Chosen quality and sizes when --max-kb / --min-ssim is in effect
+    quality: int | None = None
+    out_bytes: int = 0
+    baseline_bytes: int = 0
+    # Set when a source was converted, so the parent can update YAML references
+    dst: Path | None = None
+    # Manifest records for files written by the worker, merged by the parent
+    records: dict = field(default_factory=dict)
+    # Peak RSS of the worker process that produced this result (pool runs only)
+    worker_rss: int = 0
+
+
+@dataclass
+class RunSummary:
+    """Totals of a run, as printed in its summary line."""
+    converted: int = 0
+    resized: int = 0
+    skipped: int = 0
+    errors: int = 0
+    yaml_updates: int = 0
+    variants: int = 0
+    optimized: int = 0
+    optimized_saved: int = 0
+    # Old path -> new path of the YAML references that were updated
+    yaml_mappings: dict[Path, Path] = field(default_factory=dict)
+    exit_code: int = 0
+
+
+def to_webp_mode(im: Image.Image) -> Image.Image:
+    """Ensure a WebP-compatible mode (preserve alpha if present)."""
+    if im.mode in ("P", "LA"):
+        return im.convert("RGBA")
+    if im.mode not in ("RGB", "RGBA"):
+        return im.convert("RGB")
+    return im
+
+
+def target_size(width: int, height: int) -> tuple[int, int] | None:
+    """Size after capping the longest edge at MAX_PX, or None if it fits."""
+    if max(width, height) <= MAX_PX:
+        return None
+    scale = MAX_PX / max(width, height)
+    return round(width * scale), round(height * scale)
+
+
+def select_page(im: Image.Image, multipage: str) -> int | None:
+    """Seek a multi-page image to the page to convert; None means skip the file.
+
+    Only the page directories are read, no pixel data.
+    """
+    pages = getattr(im, "n_frames", 1)
+    if pages == 1 or multipage == "first":
+        im.seek(0)
+        return 0
+    if multipage == "skip":
+        return None
+    areas = []
+    for page in range(pages):
+        im.seek(page)
+        areas.append(im.width * im.height)
+    page = max(range(pages), key=areas.__getitem__)
+    im.seek(page)
+    return page
+
+
+def decoded_bytes(im: Image.Image) -> int:
+    """Bytes Pillow allocates for the current frame once it is decoded."""
+    if im.mode in ("1", "L", "P"):
+        return im.width * im.height
+    if im.mode.startswith("I;16"):
+        return im.width * im.height * 2
+    return im.width * im.height * 4  # multi-band and 32-bit modes use 4 bytes per pixel
+
+
+def estimate_memory(src: Path, multipage: str = "largest") -> int:
+    """Rough peak memory in bytes of converting or resizing src, from its header."""
+    try:
+        with Image.open(src) as im:
+            if select_page(im, multipage) is None:
+                return 0
+            target = target_size(*im.size)
+            if target and im.format == "JPEG":
+                im.draft(None, target)  # header only: just picks the DCT scale
+            decoded = decoded_bytes(im)
+            out_w, out_h = target or im.size
+    except Exception:
+        return 0  # the worker reports the error
+    # Decoded frame and its transposed copy, then the resized and
+    # mode-converted copies plus the encoder's own buffers
+    return 2 * decoded + 4 * out_w * out_h * 4
+
+
+def encode_result(
+    result: FileResult,
+    im: Image.Image,
+    budget: ByteBudget | None,
+    hint: tuple[int, int] | None = None,
+) -> bytes:
+    """Encode im at QUALITY, or at the budget's quality, recording sizes on result.
+
+    hint is a cached (quality, baseline size) that skips the search.
+    """
+    if budget is None:
+        return encode_webp(im, QUALITY)
+    if hint is not None:
+        result.quality, result.baseline_bytes = hint
+        data = encode_webp(im, result.quality)
+    else:
+        data, result.quality, result.baseline_bytes = choose_quality(im, budget)
+    result.out_bytes = len(data)
+    return data
+
+
+def budget_note(result: FileResult) -> str:
+    """Per-image report of the chosen quality against the fixed-quality baseline."""
+    if result.quality is None:
+        return ""
+    saved = (result.baseline_bytes - result.out_bytes) / 1024
+    return f" (q{result.quality}, {result.out_bytes / 1024:.1f} KB, saved {saved:.1f} KB vs q{QUALITY})"
+
+
+def convert_source(
+    src: Path,
+    dry_run: bool,
+    budget: ByteBudget | None = None,
+    hint: tuple[int, int] | None = None,
+    multipage: str = "largest",
+) -> FileResult:
+    """Convert a source image (.jpg/.png/...) to a .webp next to it."""
+    result = FileResult(src)
+    dst = src.with_suffix(".webp")
+
+    try:
+        action = "Would convert" if dry_run else "Converted"
+        with Image.open(src) as im:
+            pages = getattr(im, "n_frames", 1)
+            page = select_page(im, multipage)
+            if page is None:
+                result.skipped = True
+                result.message = (
+                    f"Skipping multi-page image: {src.name} ({pages} pages; "
+                    f"use --multipage largest or first to convert one)"
+                )
+                return result
+            page_note = f" (page {page + 1} of {pages})" if pages > 1 else ""
+            src_w, src_h = im.size
+            src_mode = im.mode
+            target = target_size(src_w, src_h)
+            if target and im.format == "JPEG":
+                # Decode at the smallest DCT scale (1/2, 1/4, 1/8) that is
+                # still at least the target size; LANCZOS does the rest.
+                im.draft(None, target)
+            im = ImageOps.exif_transpose(im)  # fix orientation
+
+            if target:
+                # Orientation may have swapped the axes
+                if (im.width > im.height) != (target[0] > target[1]):
+                    target = (target[1], target[0])
+                im = im.resize(target, resample=Image.Resampling.LANCZOS)
+                result.resized = True
+
+            im = to_webp_mode(im)
+            data = encode_result(result, im, budget, hint)
+
+            if not dry_run:
+                dst.write_bytes(data)
+                output = file_record(dst)
+                result.records[manifest_key(dst)] = {
+                    **output,
+                    "width": im.width,
+                    "height": im.height,
+                    "mode": im.mode,
+                    "placeholder": image_placeholder(im),
+                }
+                result.records[manifest_key(src)] = {
+                    **file_record(src),
+                    "width": src_w,
+                    "height": src_h,
+                    "mode": src_mode,
+                    "settings": encoder_settings(src_w, src_h, budget),
+                    "output": {**output, "width": im.width, "height": im.height},
+                }
+                if result.quality is not None:
+                    result.records[manifest_key(src)].update(
+                        quality=result.quality, baseline_size=result.baseline_bytes,
+                    )
+                if pages > 1:
+                    result.records[manifest_key(src)].update(pages=pages, multipage=multipage)
+
+        result.converted = True
+        result.message = f"{action}: {src.name} → {dst.name}{page_note}{budget_note(result)}"
+        if not dry_run:
+            result.dst = dst
+
+    except Exception as e:
+        result.error = True
+        result.message = f"ERROR {src}: {e}"
+
+    return result
+
+
+def resize_webp(src: Path, dry_run: bool, budget: ByteBudget | None = None) -> FileResult:
+    """Resize an existing .webp in place if it exceeds MAX_PX."""
+    result = FileResult(src)
+    try:
+        with Image.open(src) as im:
+            w, h = im.size
+
+            # Skip if already within size limit
+            if max(w, h) <= MAX_PX:
+                result.skipped = True
+                return result
+
+            # Resize needed
+            im = ImageOps.exif_transpose(im)
+            scale = MAX_PX / max(w, h)
+            new_w, new_h = round(w * scale), round(h * scale)
+            im = im.resize(
+                (new_w, new_h),
+                resample=Image.Resampling.LANCZOS,
+            )
+
+            im = to_webp_mode(im)
+            data = encode_result(result, im, budget)
+
+            # Save back to same file (overwrite)
+            if not dry_run:
+                src.write_bytes(data)
+                result.records[manifest_key(src)] = {
+                    **file_record(src),
+                    "width": new_w,
+                    "height": new_h,
+                    "mode": im.mode,
+                    "placeholder": image_placeholder(im),
+                }
+
+            result.resized = True
+            action = "Would resize" if dry_run else "Resized"
+            result.message = f"{action}: {src.name} ({w}x{h} → {new_w}x{new_h}){budget_note(result)}"
+
+    except Exception as e:
+        result.error = True
+        result.message = f"ERROR {src}: {e}"
+
+    return result
+
+
+def webp_chunks(data: bytes) -> list[tuple[bytes, int, int]]:
+    """(fourcc, start, end) of each chunk in a RIFF/WebP file; empty if not WebP."""
+    if data[:4] != b"RIFF" or data[8:12] != b"WEBP":
+        return []
+    chunks = []
+    pos = 12
+    while pos + 8 <= len(data):
+        size = int.from_bytes(data[pos + 4:pos + 8], "little")
+        end = min(pos + 8 + size + (size & 1), len(data))
+        chunks.append((data[pos:pos + 4], pos, end))
+        pos = end
+    return chunks
+
+
+def strip_webp_metadata(data: bytes) -> bytes:
+    """Drop the EXIF and XMP chunks of a WebP without touching the image data."""
+    chunks = webp_chunks(data)
+    if not chunks or chunks[0][0] != b"VP8X":
+        return data  # only the extended format carries metadata
+    kept = [data[start:end] for fourcc, start, end in chunks if fourcc not in (b"EXIF", b"XMP ")]
+    vp8x = bytearray(kept[0])
+    vp8x[8] &= ~(0x08 | 0x04)  # EXIF and XMP flags
+    body = b"WEBP" + bytes(vp8x) + b"".join(kept[1:])
+    return b"RIFF" + len(body).to_bytes(4, "little") + body
+
+
+def optimize_settings(allow_lossy: bool = False) -> dict:
+    """What --optimize-existing results depend on, cached per file in the manifest."""
+    return {
+        "quality": QUALITY,
+        "method": METHOD,
+        "min_ssim": OPTIMIZE_MIN_SSIM if NUMPY_AVAILABLE else None,
+        "metric": "color_ssim",
+        "min_saving": OPTIMIZE_MIN_SAVING,
+        "allow_lossy": allow_lossy,
+    }
+
+
+def optimize_webp(src: Path, derived: bool, dry_run: bool, allow_lossy: bool = False) -> FileResult:
+    """Replace a .webp by a smaller version that looks the same, if there is one.
+
+    derived means the file was converted from a source next to it (already
+    encoded at QUALITY), so it is only stripped of metadata. Lossless content
+    (a lossless WebP, or PNG data under a .webp name) is only re-encoded
+    losslessly unless allow_lossy.
+    Runs in a worker process when --jobs > 1.
+    """
+    result = FileResult(src)
+    try:
+        original = src.read_bytes()
+        result.original_bytes = len(original)
+        candidates: list[tuple[bytes, str]] = []
+        with Image.open(io.BytesIO(original)) as im:
+            if getattr(im, "n_frames", 1) > 1:
+                result.skipped = True
+                return result  # animations are left alone
+            fmt = im.format
+            chunks = {fourcc for fourcc, _, _ in webp_chunks(original)}
+            # Stripping EXIF would undo a rotation the browser applies
+            if fmt == "WEBP" and im.getexif().get(EXIF_ORIENTATION, 1) == 1:
+                candidates.append((strip_webp_metadata(original), "metadata stripped"))
+
+            if fmt != "WEBP" or not derived:
+                icc = im.info.get("icc_profile")
+                im = to_webp_mode(ImageOps.exif_transpose(im))
+                lossless = fmt != "JPEG" and not (fmt == "WEBP" and b"VP8L" not in chunks)
+                if lossless:
+                    # Quality 100 is maximum effort in lossless mode
+                    candidates.append((encode_webp(im, 100, lossless=True, icc_profile=icc), "lossless"))
+                if NUMPY_AVAILABLE and (allow_lossy or not lossless):
+                    data = encode_webp(im, QUALITY, icc_profile=icc)
+                    with Image.open(io.BytesIO(data)) as out:
+                        score = color_ssim(im, out)
+                    if score >= OPTIMIZE_MIN_SSIM:
+                        candidates.append((data, f"q{QUALITY}, SSIM {score:.3f}"))
+
+        # Stripping leaves the pixels alone, so any saving counts
+        worthwhile = [
+            (data, how) for data, how in candidates
+            if len(data) < len(original) * (1 if how == "metadata stripped" else 1 - OPTIMIZE_MIN_SAVING)
+        ]
+        if not worthwhile:
+            if not dry_run:
+                result.records[manifest_key(src)] = {**file_record(src), **image_info(src, allow_lossy)}
+            result.skipped = True
+            return result
+
+        data, how = min(worthwhile, key=lambda candidate: len(candidate[0]))
+        if not dry_run:
+            write_atomic(src, data)
+            result.records[manifest_key(src)] = {**file_record(src), **image_info(src, allow_lossy)}
+        result.optimized = True
+        result.saved_bytes = len(original) - len(data)
+        action = "Would optimize" if dry_run else "Optimized"
+        result.message = (
+            f"{action}: {src.name} {len(original) / 1024:.1f} KB → {len(data) / 1024:.1f} KB ({how})"
+        )
+
+    except Exception as e:
+        result.error = True
+        result.message = f"ERROR {src}: {e}"
+
+    return result
+
+
+def image_info(path: Path, allow_lossy: bool = False) -> dict:
+    """Dimensions and mode from an image header, plus the optimize marker."""
+    with Image.open(path) as im:
+        return {"width": im.width, "height": im.height, "mode": im.mode, "optimized": optimize_settings(allow_lossy)}
+
+
+def plan_optimize(src: Path, entries: dict, allow_lossy: bool = False) -> bool:
+    """Whether --optimize-existing has to look at a .webp (not done with these settings)."""
+    record = entries.get(manifest_key(src))
+    return not (is_fresh(record, src) and record.get("optimized") == optimize_settings(allow_lossy))
+
+
+def plan_source(
+    src: Path,
+    entries: dict,
+    budget: ByteBudget | None = None,
+    multipage: str = "largest",
+) -> FileResult | None:
+    """Decide from the manifest alone whether a source needs converting.
+
+    Returns a skipped result, or None when the file has to go to a worker.
+    """
+    key = manifest_key(src)
+    record = entries.get(key)
+    dst = src.with_suffix(".webp")
+
+    # No record yet: keep the old rule (webp output newer than source) and
+    # adopt the pair into the manifest from image headers only.
+    if record is None and dst.exists() and dst.stat().st_mtime >= src.stat().st_mtime:
+        try:
+            with Image.open(src) as im, Image.open(dst) as out:
+                record = entries[key] = {
+                    **file_record(src),
+                    "width": im.width,
+                    "height": im.height,
+                    "mode": im.mode,
+                    "settings": encoder_settings(im.width, im.height),
+                    "output": {**file_record(dst), "width": out.width, "height": out.height},
+                }
+        except Exception:
+            return None  # let the worker report the error
+
+    if (
+        record is not None
+        and is_fresh(record, src)
+        and is_fresh(record.get("output"), dst)
+        and record.get("settings") == encoder_settings(record["width"], record["height"], budget)
+        and record.get("multipage", multipage) == multipage
+    ):
+        return FileResult(src, skipped=True)
+    return None
+
+
+def quality_hint(src: Path, entries: dict, budget: ByteBudget | None) -> tuple[int, int] | None:
+    """Cached (quality, baseline size) of a source whose search result still applies."""
+    record = entries.get(manifest_key(src))
+    if budget is None or record is None or "quality" not in record:
+        return None
+    if not is_fresh(record, src):
+        return None
+    if record.get("settings") != encoder_settings(record["width"], record["height"], budget):
+        return None
+    return record["quality"], record["baseline_size"]
+
+
+def webp_record(src: Path, entries: dict) -> dict | None:
+    """Fresh manifest record of a .webp, read from its header if needed."""
+    key = manifest_key(src)
+    record = entries.get(key)
+
+    if not is_fresh(record, src):
+        try:
+            # Image.open only parses the header; no pixel data is decoded here
+            with Image.open(src) as im:
+                record = {**file_record(src), "width": im.width, "height": im.height, "mode": im.mode}
+        except Exception:
+            return None
+        entries[key] = record
+    return record
+
+
+def plan_webp(src: Path, entries: dict) -> FileResult | None:
+    """Decide whether a .webp needs resizing, using cached dimensions when fresh."""
+    record = webp_record(src, entries)
+    if record is None:
+        return None  # let the worker report the error
+
+    if max(record["width"], record["height"]) <= MAX_PX:
+        return FileResult(src, skipped=True)
+    return None
+
+
+def plan_image(
+    src: Path,
+    entries: dict,
+    budget: ByteBudget | None = None,
+    multipage: str = "largest",
+) -> FileResult | None:
+    """Resolve a file in the parent if possible; None means it needs a worker."""
+    suffix_lower = src.suffix.lower()
+
+    # Skip ignored files
+    if src.name.lower() in IGNORE_FILES:
+        return FileResult(src, message=f"Skipping ignored file: {src.name}")
+
+    # Handle source formats (convert to webp)
+    if suffix_lower in SOURCE_FORMATS:
+        return plan_source(src, entries, budget, multipage)
+
+    # Handle existing webp files (resize only if too large)
+    if suffix_lower in WEBP_FORMAT:
+        return plan_webp(src, entries)
+
+    return FileResult(src)
+
+
+def process_image(
+    src: Path,
+    hint: tuple[int, int] | None,
+    dry_run: bool,
+    budget: ByteBudget | None = None,
+    multipage: str = "largest",
+) -> FileResult:
+    """Convert or resize a single file. Runs in a worker process when --jobs > 1."""
+    if src.suffix.lower() in SOURCE_FORMATS:
+        return convert_source(src, dry_run, budget, hint, multipage)
+    return resize_webp(src, dry_run, budget)
+
+
+def process_referenced(src: Path, widths: list[int], dry_run: bool) -> FileResult:
+    """Write width variants and the placeholder of a referenced .webp.
+
+    The image is decoded once for both. Runs in a worker process when --jobs > 1.
+    """
+    result = FileResult(src)
+    labels = ", ".join(f"{width}w" for width in widths)
+    try:
+        if dry_run:
+            if widths:
+                result.message = f"Would create variants: {src.name} → {labels}"
+                result.variants = len(widths)
+            return result
+
+        source = file_record(src)
+        with Image.open(src) as im:
+            mode = im.mode
+            im = to_webp_mode(im)
+            result.records[manifest_key(src)] = {
+                **source,
+                "width": im.width,
+                "height": im.height,
+                "mode": mode,
+                "placeholder": image_placeholder(im),
+            }
+            if widths:
+                VARIANTS_DIR.mkdir(exist_ok=True)
+            for width in widths:
+                height = max(1, round(im.height * width / im.width))
+                variant = im.resize((width, height), resample=Image.Resampling.LANCZOS)
+                dst = variant_path(src, width)
+                variant.save(dst, "WEBP", quality=QUALITY, method=METHOD)
+                result.records[manifest_key(dst)] = {
+                    **file_record(dst),
+                    "width": width,
+                    "height": height,
+                    "mode": variant.mode,
+                    "variant": variant_settings(source),
+                }
+                result.variants += 1
+        if widths:
+            result.message = f"Created variants: {src.name} → {labels}"
+
+    except Exception as e:
+        result.error = True
+        result.message = f"ERROR {src}: {e}"
+
+    return result
+
+
+def run_measured(fn, *args) -> FileResult:
+    """Call fn in a worker and record the worker's own peak RSS on its result.
+
+    The workers are children of the fork server, not of this process, so
+    RUSAGE_CHILDREN does not see them; each one reports itself instead.
+    """
+    result = fn(*args)
+    result.worker_rss = peak_rss()
+    return result
+
+
+class WorkerPool:
+    """Maps work over a process pool that is only started when needed."""
+
+    def __init__(self, jobs: int, max_memory: int | None = None):
+        self.jobs = jobs
+        self.max_memory = max_memory
+        self.executor: ProcessPoolExecutor | None = None
+        # Largest worker_rss seen so far, 0 while no worker has run
+        self.worker_rss = 0
+
+    def map(self, fn, *iterables, costs: list[int] | None = None):
+        """Ordered map of fn; runs in-process for --jobs 1 or a single item.
+
+        With costs (estimated bytes per item) and a max_memory budget, an item
+        is only handed to a worker while the items in flight fit the budget.
+        """
+        if self.jobs > 1 and len(iterables[0]) > 1:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.jobs, mp_context=pool_context())
+            fn = partial(run_measured, fn)
+            if costs is None or self.max_memory is None:
+                return self.measured(self.executor.map(fn, *iterables))
+            return self.measured(self.bounded_map(fn, list(zip(*iterables)), costs))
+        return map(fn, *iterables)
+
+    def measured(self, results):
+        for result in results:
+            self.worker_rss = max(self.worker_rss, result.worker_rss)
+            yield result
+
+    def bounded_map(self, fn, items: list[tuple], costs: list[int]):
+        """Submit items in order under the memory budget, yield results in order."""
+        ordered: deque = deque()
+        running: dict = {}  # future -> admitted cost
+        for args, cost in zip(items, costs):
+            # An item over the whole budget is admitted alone
+            cost = min(cost, self.max_memory)
+            while running and (len(running) >= self.jobs or sum(running.values()) + cost > self.max_memory):
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+            future = self.executor.submit(fn, *args)
+            running[future] = cost
+            ordered.append(future)
+            while ordered and ordered[0].done():
+                yield ordered.popleft().result()
+        while ordered:
+            yield ordered.popleft().result()
+
+    def __enter__(self) -> WorkerPool:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+def parse_size(value: str) -> int:
+    """Parse a byte size like 512M, 2G or 1500000."""
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = value.strip().upper().removesuffix("B")
+    scale = units.get(text[-1:], 1)
+    if scale > 1:
+        text = text[:-1]
+    try:
+        size = int(float(text) * scale)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {value!r}") from None
+    if size <= 0:
+        raise argparse.ArgumentTypeError("size must be positive")
+    return size
+
+
+def default_max_memory() -> int | None:
+    """Half the physical memory, or None (no limit) where that is unknown."""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 2
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def peak_rss() -> int:
+    """Peak resident memory of the calling process in bytes, 0 where unknown."""
+    if resource is None:
+        return 0
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+
+
+def peak_rss_note(worker_rss: int = 0) -> str:
+    """Peak resident memory of this process and of the largest worker, if any ran."""
+    parent = peak_rss()
+    if not parent:
+        return ""
+    note = f"  peak RSS: {parent / 1024 ** 2:.0f} MB"
+    if worker_rss:
+        note += f" (largest worker {worker_rss / 1024 ** 2:.0f} MB)"
+    return note
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Convert and resize images for web use.")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would change without writing files")
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=os.cpu_count() or 1,
+        help="Number of worker processes for conversion (default: CPU count, 1 = serial)",
+    )
+    parser.add_argument(
+        "--only", nargs="+", metavar="PATH",
+        help="Only process these files (other images are taken from cached data)",
+    )
+    parser.add_argument(
+        "--changed-since", metavar="REF",
+        help="Only process files changed since this git ref (plus uncommitted and untracked files)",
+    )
+    parser.add_argument(
+        "--max-kb", "--target-kb", type=float, dest="max_kb",
+        help="Byte budget per encoded image: use the highest quality whose output fits",
+    )
+    parser.add_argument(
+        "--min-ssim", type=float,
+        help="Never choose a quality whose SSIM against the input is below this (e.g. 0.95)",
+    )
+    parser.add_argument(
+        "--max-memory", type=parse_size, default=default_max_memory(), metavar="SIZE",
+        help="Estimated decode memory allowed across workers, e.g. 2G or 512M "
+             "(default: half the physical memory)",
+    )
+    parser.add_argument(
+        "--optimize-existing", action="store_true",
+        help="Also shrink existing .webp files when a smaller version looks the same",
+    )
+    parser.add_argument(
+        "--allow-lossy", action="store_true",
+        help="With --optimize-existing, also try lossy re-encodes of lossless images (PNG content, lossless WebP)",
+    )
+    parser.add_argument(
+        "--multipage", choices=MULTIPAGE_CHOICES, default="largest",
+        help="Which page of a multi-page TIFF to convert, or skip such files (default: largest)",
+    )
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.max_kb is not None and args.max_kb <= 0:
+        parser.error("--max-kb must be positive")
+    if args.min_ssim is not None and not 0 < args.min_ssim <= 1:
+        parser.error("--min-ssim must be between 0 and 1")
+    if args.min_ssim is not None and not NUMPY_AVAILABLE:
+        parser.error("--min-ssim needs numpy (pip install numpy)")
+    return args
+
+
+def run(args: argparse.Namespace, blog: BlogYaml | None = None) -> RunSummary:
+    """Do the work described by args (from parse_args), printing the report."""
+    dry_run = args.dry_run
+    budget = None
+    if args.max_kb is not None or args.min_ssim is not None:
+        budget = ByteBudget(
+            max_bytes=round(args.max_kb * 1024) if args.max_kb is not None else None,
+            min_ssim=args.min_ssim,
+        )
 
     if not INPUT_DIR.is_dir():
         print(f"Missing folder: {INPUT_DIR.resolve()}")
-        return 2
-
-    converted = resized = skipped = errors = yaml_updates = 0
-
-    for src in INPUT_DIR.rglob("*"):
-        if not src.is_file():
-            continue
-        
-        suffix_lower = src.suffix.lower()
-        
-        # Skip ignored files
-        if src.name.lower() in IGNORE_FILES:
-            print(f"Skipping ignored file: {src.name}")
-            continue
-
-        # Handle source formats (convert to webp)
-        if suffix_lower in SOURCE_FORMATS:
-            dst = src.with_suffix(".webp")
-
-            # Skip if webp output exists and is newer than source
-            if dst.exists() and dst.stat().st_mtime >= src.stat().st_mtime:
-                skipped += 1
+        return RunSummary(exit_code=2)
+
+    try:
+        scope = resolve_scope(args.only, args.changed_since)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return RunSummary(exit_code=2)
+
+    converted = resized = skipped = errors = yaml_updates = variants = 0
+    optimized = optimized_before = optimized_saved = 0
+    yaml_mappings: dict[Path, Path] = {}
+    out_bytes = baseline_bytes = 0
+
+    files = [
+        src for src in INPUT_DIR.rglob("*")
+        if src.is_file() and src != MANIFEST_PATH and VARIANTS_DIR not in src.parents
+        and in_scope(src, scope)
+    ]
+    if scope is not None:
+        images = sum(src.suffix.lower() in SOURCE_FORMATS | WEBP_FORMAT for src in files)
+        print(f"Limited to {images} changed image(s)")
+    entries = load_manifest()
+    yaml_models = load_yaml_files(blog)
+
+    # Unchanged files are resolved from the manifest; only the rest is decoded
+    planned = [plan_image(src, entries, budget, args.multipage) for src in files]
+    # A .webp that is regenerated from its source in this run needs no resize
+    # of its own (and must not be written by two workers at once)
+    regenerated = {
+        src.with_suffix(".webp")
+        for src, result in zip(files, planned)
+        if result is None and src.suffix.lower() in SOURCE_FORMATS
+    }
+    planned = [
+        FileResult(src, skipped=True) if src in regenerated else result
+        for src, result in zip(files, planned)
+    ]
+    work = [src for src, result in zip(files, planned) if result is None]
+    hints = [quality_hint(src, entries, budget) for src in work]
+    costs = [estimate_memory(src, args.multipage) for src in work]
+    if args.jobs > 1 and args.max_memory is not None:
+        for src, cost in zip(work, costs):
+            if cost > args.max_memory:
+                print(f"Large image, processing alone: {src.name} (~{cost / 1024 ** 2:.0f} MB)")
+
+    # Results are consumed in input order, so output matches the serial run.
+    # YAML files and the manifest are only ever edited here, in the parent.
+    with WorkerPool(args.jobs, args.max_memory) as pool:
+        worked = pool.map(
+            partial(process_image, dry_run=dry_run, budget=budget, multipage=args.multipage),
+            work, hints, costs=costs,
+        )
+
+        for result in planned:
+            if result is None:
+                result = next(worked)
+            entries.update(result.records)
+            converted += result.converted
+            out_bytes += result.out_bytes
+            baseline_bytes += result.baseline_bytes
+            resized += result.resized
+            skipped += result.skipped
+            errors += result.error
+            if result.message:
+                print(result.message)
+
+            # Collected here, applied to the YAML files in one pass below
+            if result.dst is not None:
+                yaml_mappings[result.src] = result.dst
+            # A freshly converted .webp needs its variants rebuilt too
+            if scope is not None and result.converted:
+                scope.add(result.src.with_suffix(".webp").resolve())
+
+        # Update YAML files to reference the new webp files
+        yaml_counts = update_yaml_references(yaml_mappings, yaml_models)
+        yaml_updates = sum(yaml_counts.values())
+
+        if args.optimize_existing:
+            # .webp outputs of a source in the same folder, by output path
+            # (looked up in the whole folder: the source may be out of scope)
+            sources = {
+                src.with_suffix(".webp"): src for src in INPUT_DIR.rglob("*")
+                if src.suffix.lower() in SOURCE_FORMATS and VARIANTS_DIR not in src.parents
+            }
+            candidates = [
+                src for src in files
+                if src.suffix.lower() in WEBP_FORMAT and src.name.lower() not in IGNORE_FILES
+                and src not in regenerated and plan_optimize(src, entries, args.allow_lossy)
+            ]
+            worked = pool.map(
+                partial(optimize_webp, dry_run=dry_run, allow_lossy=args.allow_lossy),
+                candidates,
+                [src in sources for src in candidates],
+                costs=[estimate_memory(src) for src in candidates],
+            )
+            for result in worked:
+                # The placeholder still applies: the pixels look the same
+                for key, record in result.records.items():
+                    entries[key] = {**entries.get(key, {}), **record}
+                errors += result.error
+                if result.message:
+                    print(result.message)
+                if not result.optimized:
+                    continue
+                optimized += 1
+                optimized_before += result.original_bytes
+                optimized_saved += result.saved_bytes
+                # Keep the source's record pointing at the new output, so the
+                # smaller file is not mistaken for a stale conversion
+                source = entries.get(manifest_key(sources.get(result.src, result.src)))
+                if not dry_run and result.src in sources and source and "output" in source:
+                    record = entries[manifest_key(result.src)]
+                    source["output"] = {
+                        **{key: record[key] for key in ("size", "mtime_ns", "sha256")},
+                        "width": record["width"],
+                        "height": record["height"],
+                    }
+
+        # Width variants and placeholders of every referenced image, built
+        # from the final .webp
+        variant_map: dict[str, list[dict]] = {}
+        image_meta: dict[str, dict] = {}
+        previous_map = load_json(VARIANTS_MAP)
+        previous_meta = load_json(IMAGE_META)
+        expected_variants: set[Path] = set()
+        referenced: list[tuple[str, Path]] = []
+        referenced_work: list[tuple[Path, list[int]]] = []
+        for image in referenced_images(yaml_models):
+            src = Path(unquote(image))
+            if src.suffix.lower() not in WEBP_FORMAT or INPUT_DIR not in src.parents:
+                continue
+            if not in_scope(src, scope) and image in previous_meta:
+                # Out of scope: keep what the last full run produced
+                image_meta[image] = previous_meta[image]
+                if image in previous_map:
+                    variant_map[image] = previous_map[image]
+                    expected_variants.update(
+                        Path(unquote(variant["src"])) for variant in previous_map[image] if variant["src"] != image
+                    )
+                continue
+            record = webp_record(src, entries)
+            if record is None:
                 continue
+            referenced.append((image, src))
+            widths = variant_widths(record["width"])
+            stale = []
+            for width in widths:
+                dst = variant_path(src, width)
+                expected_variants.add(dst)
+                variant_record = entries.get(manifest_key(dst))
+                if not (
+                    is_fresh(variant_record, dst)
+                    and variant_record.get("variant") == variant_settings(record)
+                ):
+                    stale.append(width)
+            if stale or "placeholder" not in record:
+                referenced_work.append((src, stale))
+            if widths:
+                variant_map[image] = [
+                    {"src": quote(manifest_key(variant_path(src, width))), "width": width}
+                    for width in widths
+                ] + [{"src": image, "width": record["width"]}]
 
-            try:
-                action = "Would convert" if dry_run else "Converted"
-                with Image.open(src) as im:
-                    im = ImageOps.exif_transpose(im)  # fix orientation
-                    w, h = im.size
-
-                    if max(w, h) > MAX_PX:
-                        scale = MAX_PX / max(w, h)
-                        im = im.resize(
-                            (round(w * scale), round(h * scale)),
-                            resample=Image.Resampling.LANCZOS,
-                        )
-                        resized += 1
-
-                    # ensure WebP-compatible mode (preserve alpha if present)
-                    if im.mode in ("P", "LA"):
-                        im = im.convert("RGBA")
-                    elif im.mode not in ("RGB", "RGBA"):
-                        im = im.convert("RGB")
-
-                    if not dry_run:
-                        im.save(dst, "WEBP", quality=QUALITY, method=METHOD)
-
-                converted += 1
-                print(f"{action}: {src.name} → {dst.name}")
-                
-                # Update YAML files to reference the new webp file
+        # Referenced images are at most MAX_PX, so these need no memory budget
+        worked = pool.map(
+            partial(process_referenced, dry_run=dry_run),
+            [src for src, _ in referenced_work],
+            [widths for _, widths in referenced_work],
+        )
+        for result in worked:
+            entries.update(result.records)
+            variants += result.variants
+            errors += result.error
+            if result.message:
+                print(result.message)
+
+    # Variants of images that were renamed or are no longer referenced; a
+    # scoped run knows the rest from the variants map it carried over
+    if VARIANTS_DIR.is_dir():
+        for stale_variant in sorted(VARIANTS_DIR.iterdir()):
+            if stale_variant.is_file() and stale_variant not in expected_variants:
+                action = "Would remove" if dry_run else "Removed"
                 if not dry_run:
-                    yaml_updates += update_yaml_references(src, dst)
-
-            except Exception as e:
-                errors += 1
-                print(f"ERROR {src}: {e}")
-        
-        # Handle existing webp files (resize only if too large)
-        elif suffix_lower in WEBP_FORMAT:
-            try:
-                with Image.open(src) as im:
-                    w, h = im.size
-                    
-                    # Skip if already within size limit
-                    if max(w, h) <= MAX_PX:
-                        skipped += 1
-                        continue
-                    
-                    # Resize needed
-                    im = ImageOps.exif_transpose(im)
-                    scale = MAX_PX / max(w, h)
-                    new_w, new_h = round(w * scale), round(h * scale)
-                    im = im.resize(
-                        (new_w, new_h),
-                        resample=Image.Resampling.LANCZOS,
-                    )
-                    
-                    # ensure WebP-compatible mode
-                    if im.mode in ("P", "LA"):
-                        im = im.convert("RGBA")
-                    elif im.mode not in ("RGB", "RGBA"):
-                        im = im.convert("RGB")
-                    
-                    # Save back to same file (overwrite)
-                    if not dry_run:
-                        im.save(src, "WEBP", quality=QUALITY, method=METHOD)
-                    
-                    resized += 1
-                    action = "Would resize" if dry_run else "Resized"
-                    print(f"{action}: {src.name} ({w}x{h} → {new_w}x{new_h})")
-                
-            except Exception as e:
-                errors += 1
-                print(f"ERROR {src}: {e}")
-
-    print(f"\nSummary: converted={converted} resized={resized} skipped={skipped} errors={errors} yaml_updates={yaml_updates}")
-    return 0 if errors == 0 else 2
+                    stale_variant.unlink()
+                    entries.pop(manifest_key(stale_variant), None)
+                print(f"{action} stale variant: {stale_variant.name}")
+
+    if not dry_run:
+        write_json(VARIANTS_MAP, variant_map)
+        for image, src in referenced:
+            record = entries.get(manifest_key(src))
+            if record is not None:
+                image_meta[image] = {
+                    "width": record["width"],
+                    "height": record["height"],
+                    **record.get("placeholder", {}),
+                }
+        write_json(IMAGE_META, image_meta)
+        if scope is None:
+            # Drop records of files that no longer exist
+            seen = {manifest_key(src) for src in files} | {manifest_key(dst) for dst in expected_variants}
+            entries = {key: record for key, record in entries.items() if key in seen}
+        save_manifest(entries)
+
+    print(f"\nSummary: converted={converted} resized={resized} skipped={skipped} errors={errors} yaml_updates={yaml_updates} variants={variants}")
+    if budget is not None and baseline_bytes:
+        print(
+            f"  budget: {out_bytes / 1024:.1f} KB written vs {baseline_bytes / 1024:.1f} KB at q{QUALITY} "
+            f"(saved {(baseline_bytes - out_bytes) / 1024:.1f} KB)"
+        )
+    if args.optimize_existing:
+        print(
+            f"  optimized: {optimized} file(s), {optimized_before / 1024:.1f} KB → "
+            f"{(optimized_before - optimized_saved) / 1024:.1f} KB (saved {optimized_saved / 1024:.1f} KB)"
+        )
+    for old_path, count in yaml_counts.items():
+        if count:
+            print(f"  yaml: {old_path.name} → {yaml_mappings[old_path].name} ({count})")
+    rss = peak_rss_note(pool.worker_rss)
+    if rss:
+        print(rss)
+    return RunSummary(
+        converted=converted,
+        resized=resized,
+        skipped=skipped,
+        errors=errors,
+        yaml_updates=yaml_updates,
+        variants=variants,
+        optimized=optimized,
+        optimized_saved=optimized_saved,
+        yaml_mappings={old: yaml_mappings[old] for old, count in yaml_counts.items() if count},
+        exit_code=0 if errors == 0 else 2,
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    return run(parse_args(argv)).exit_code
 
 if __name__ == "__main__":
     raise SystemExit(main())
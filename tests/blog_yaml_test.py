@@ -0,0 +1,174 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from blog_yaml import BlogYaml, diff_entries  # noqa: E402
+
+
+SAMPLE = """# Nieuwste berichten bovenaan
+- title: Eerste optreden
+  date: 14 september 2025
+  image: content/images/20250914_eerste.webp
+  link: https://example.com/
+  content: |
+    Een zin: met een dubbele punt.
+
+    Tweede alinea.
+
+- title: "Tweede: met quotes"
+  date: 2 november 2025
+  image: "content/images/20251102_tweede.webp"
+  #image: content/images/oud.webp
+  content: Korte tekst
+    over twee regels.
+
+- title: Derde
+  date: 1 mei 2024
+  image: content/images/oude%20foto.jpg
+  content: |
+    Derde tekst.
+"""
+
+
+def entries_text(*entries):
+    return "".join(entries)
+
+
+ENTRY_A = "- title: A\n  date: 1 mei 2024\n  image: content/images/a.webp\n  content: |\n    Tekst A.\n\n"
+ENTRY_B = "- title: B\n  date: 2 mei 2024\n  image: content/images/b.webp\n  content: |\n    Tekst B.\n\n"
+ENTRY_C = "- title: C\n  date: 3 mei 2024\n  image: content/images/c.webp\n  content: |\n    Tekst C.\n    Nog een regel.\n\n"
+ENTRY_D = "- title: D\n  date: 4 mei 2024\n  image: content/images/d.webp\n  content: Tekst D.\n\n"
+
+
+class RoundTripTests(unittest.TestCase):
+    def test_render_without_edits_is_byte_identical(self):
+        for text in (SAMPLE, SAMPLE.replace("\n", "\r\n"), (REPO_ROOT / "content" / "blog.yaml").read_text(encoding="utf-8")):
+            self.assertEqual(BlogYaml(text).render(), text)
+
+    def test_save_without_edits_leaves_the_file_alone(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "blog.yaml"
+            path.write_bytes(SAMPLE.encode("utf-8"))
+            blog = BlogYaml.load(path)
+
+            self.assertFalse(blog.save())
+            self.assertEqual(path.read_bytes(), SAMPLE.encode("utf-8"))
+
+    def test_fields_and_lines(self):
+        blog = BlogYaml(SAMPLE)
+
+        self.assertEqual([entry.line for entry in blog.entries], [2, 11, 18])
+        self.assertEqual(blog.entries[1]["title"], '"Tweede: met quotes"')
+        # The commented-out image is not a field
+        self.assertEqual(blog.entries[1].fields["image"].line, 13)
+        self.assertEqual(blog.value_lines(blog.entries[0], "content"), ["Een zin: met een dubbele punt.", "", "Tweede alinea."])
+        self.assertEqual(blog.value_lines(blog.entries[1], "content"), ["Korte tekst", "over twee regels."])
+
+    def test_titles_are_indexed_without_quotes(self):
+        blog = BlogYaml(SAMPLE)
+
+        self.assertEqual(blog.by_title["Tweede: met quotes"], [blog.entries[1]])
+        self.assertEqual(blog.by_title["Eerste optreden"], [blog.entries[0]])
+        self.assertNotIn('"Tweede: met quotes"', blog.by_title)
+
+
+class ReplaceImageTests(unittest.TestCase):
+    def replaced(self, old, new):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "blog.yaml"
+            path.write_text(SAMPLE, encoding="utf-8")
+            blog = BlogYaml.load(path)
+            count = blog.replace_image(old, new)
+            blog.save()
+            return count, path.read_text(encoding="utf-8"), blog
+
+    def test_unquoted_image(self):
+        count, text, blog = self.replaced("content/images/20250914_eerste.webp", "content/images/20250914_nieuw.webp")
+
+        self.assertEqual(count, 1)
+        self.assertEqual(
+            text,
+            SAMPLE.replace("image: content/images/20250914_eerste.webp", "image: content/images/20250914_nieuw.webp"),
+        )
+        # The model is re-parsed after the write
+        self.assertEqual(blog.with_image("content/images/20250914_nieuw.webp"), [blog.entries[0]])
+
+    def test_quoted_image_keeps_its_quotes(self):
+        count, text, _ = self.replaced("content/images/20251102_tweede.webp", "content/images/20251102_nieuw.webp")
+
+        self.assertEqual(count, 1)
+        self.assertIn('  image: "content/images/20251102_nieuw.webp"\n', text)
+        self.assertIn("  #image: content/images/oud.webp\n", text)
+
+    def test_single_quoted_image(self):
+        blog = BlogYaml(SAMPLE.replace('"content/images/20251102_tweede.webp"', "'content/images/20251102_tweede.webp'"))
+
+        self.assertEqual(blog.replace_image("content/images/20251102_tweede.webp", "content/images/x.webp"), 1)
+        self.assertIn("  image: 'content/images/x.webp'\n", blog.render())
+
+    def test_url_encoded_image_stays_encoded(self):
+        count, text, _ = self.replaced("content/images/oude foto.jpg", "content/images/nieuwe foto.webp")
+
+        self.assertEqual(count, 1)
+        self.assertIn("  image: content/images/nieuwe%20foto.webp\n", text)
+
+    def test_only_whole_values_match(self):
+        blog = BlogYaml(SAMPLE)
+
+        self.assertEqual(blog.replace_image("content/images/20250914_eerste", "content/images/x"), 0)
+        self.assertEqual(blog.render(), SAMPLE)
+
+
+class DiffEntriesTests(unittest.TestCase):
+    def test_identical(self):
+        blog = BlogYaml(SAMPLE)
+        diff = diff_entries(blog, BlogYaml(SAMPLE))
+
+        self.assertEqual((diff.added, diff.removed, diff.changed, diff.moved), ([], [], [], 0))
+
+    def test_reordered_entries_are_moved_not_changed(self):
+        old = BlogYaml(entries_text(ENTRY_A, ENTRY_B, ENTRY_C, ENTRY_D))
+        new = BlogYaml(entries_text(ENTRY_D, ENTRY_A, ENTRY_B, ENTRY_C))
+        diff = diff_entries(old, new)
+
+        self.assertEqual((diff.added, diff.removed, diff.changed), ([], [], []))
+        self.assertEqual(diff.moved, 1)
+
+    def test_swapped_pairs(self):
+        old = BlogYaml(entries_text(ENTRY_A, ENTRY_B, ENTRY_C, ENTRY_D))
+        new = BlogYaml(entries_text(ENTRY_B, ENTRY_A, ENTRY_D, ENTRY_C))
+
+        self.assertEqual(diff_entries(old, new).moved, 2)
+
+    def test_added_and_removed(self):
+        old = BlogYaml(entries_text(ENTRY_A, ENTRY_B, ENTRY_C))
+        new = BlogYaml(entries_text(ENTRY_D, ENTRY_A, ENTRY_C))
+        diff = diff_entries(old, new)
+
+        self.assertEqual([entry["title"] for entry in diff.added], ["D"])
+        self.assertEqual([entry["title"] for entry in diff.removed], ["B"])
+        self.assertEqual((diff.changed, diff.moved), ([], 0))
+
+    def test_changed_fields(self):
+        old = BlogYaml(entries_text(ENTRY_A, ENTRY_C))
+        new = BlogYaml(entries_text(ENTRY_A, ENTRY_C.replace("Nog een regel.", "Nog een andere regel.")))
+        diff = diff_entries(old, new)
+
+        self.assertEqual([(before.index, after.index, names) for before, after, names in diff.changed], [(1, 1, ["content"])])
+        self.assertEqual((diff.added, diff.removed), ([], []))
+
+    def test_edited_title_is_still_paired(self):
+        old = BlogYaml(entries_text(ENTRY_A, ENTRY_B))
+        new = BlogYaml(entries_text(ENTRY_A, ENTRY_B.replace("title: B", "title: B (verbeterd)")))
+        diff = diff_entries(old, new)
+
+        self.assertEqual([names for _, _, names in diff.changed], [["title"]])
+        self.assertEqual((diff.added, diff.removed), ([], []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,223 @@
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from manage_blog_images import (  # noqa: E402
+    HASH_DISTANCE_THRESHOLD,
+    IMAGES_DIR,
+    INDEX_ROOTS,
+    PARTIAL_HASH_BYTES,
+    HashCache,
+    HashIndex,
+    ReferenceIndex,
+    exact_duplicate_groups,
+    group_similar,
+    hamming,
+    missing_references,
+    order_index_group,
+)
+
+
+def flip(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def brute_force_groups(hashes, scoped=None):
+    """Union-find over all pairs within HASH_DISTANCE_THRESHOLD."""
+    parent = list(range(len(hashes)))
+
+    def find(x):
+        while parent[x] != x:
+            x = parent[x]
+        return x
+
+    for i in range(len(hashes)):
+        for j in range(len(hashes)):
+            if i == j or (scoped is not None and not scoped[i]):
+                continue
+            if hamming(hashes[i], hashes[j]) <= HASH_DISTANCE_THRESHOLD:
+                parent[find(i)] = find(j)
+    groups = {}
+    for i in range(len(hashes)):
+        groups.setdefault(find(i), []).append(i)
+    return canonical(groups.values())
+
+
+def canonical(groups):
+    return {tuple(sorted(group)) for group in groups}
+
+
+def boundary_hashes(bits, seed=0):
+    """Random hashes plus copies at, just over and well under the threshold.
+
+    The flipped bits are spread over the index chunks in different ways:
+    all in one chunk, evenly, and at chunk edges.
+    """
+    rng = random.Random(seed)
+    chunk = -(-bits // 4)
+    hashes = []
+    for _ in range(40):
+        base = rng.getrandbits(bits)
+        hashes.append(base)
+        for distance in (1, HASH_DISTANCE_THRESHOLD - 1, HASH_DISTANCE_THRESHOLD, HASH_DISTANCE_THRESHOLD + 1):
+            hashes.append(flip(base, rng.sample(range(bits), distance)))
+        # Threshold reached inside a single chunk, and spread evenly over all
+        hashes.append(flip(base, range(HASH_DISTANCE_THRESHOLD)))
+        hashes.append(flip(base, [c * chunk + k for c in range(4) for k in range(HASH_DISTANCE_THRESHOLD // 4)]))
+        # One bit over, straddling chunk edges
+        hashes.append(flip(base, [c * chunk + k for c in range(1, 4) for k in (-2, -1, 0)]))
+    return hashes
+
+
+class HashIndexTests(unittest.TestCase):
+    def test_search_matches_brute_force(self):
+        for bits in (64, 72):
+            hashes = boundary_hashes(bits)
+            index = HashIndex(bits, HASH_DISTANCE_THRESHOLD)
+            for value in hashes:
+                index.add(value)
+            for value in hashes:
+                expected = {i for i, other in enumerate(hashes) if hamming(value, other) <= HASH_DISTANCE_THRESHOLD}
+                self.assertEqual(set(index.search(value)), expected)
+
+    def test_threshold_is_inclusive(self):
+        index = HashIndex(64, HASH_DISTANCE_THRESHOLD)
+        index.add(0)
+        at = flip(0, range(HASH_DISTANCE_THRESHOLD))
+        over = flip(0, range(HASH_DISTANCE_THRESHOLD + 1))
+
+        self.assertEqual(index.search(at), [0])
+        self.assertEqual(index.search(over), [])
+
+    def test_group_similar_matches_brute_force(self):
+        for bits in (64, 72):
+            hashes = boundary_hashes(bits, seed=bits)
+            self.assertEqual(canonical(group_similar(hashes, bits)), brute_force_groups(hashes))
+
+    def test_group_similar_scoped_matches_brute_force(self):
+        hashes = boundary_hashes(64, seed=1)
+        scoped = [i % 3 == 0 for i in range(len(hashes))]
+
+        self.assertEqual(canonical(group_similar(hashes, 64, scoped)), brute_force_groups(hashes, scoped))
+
+
+class ExactDuplicateTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.rng = random.Random(0)
+
+    def write(self, name, data):
+        path = Path(self.tmp.name) / name
+        path.write_bytes(data)
+        return path
+
+    def groups(self, files):
+        cache = HashCache(None)
+        groups = exact_duplicate_groups(files, cache, lambda path: path.stat().st_size)
+        return sorted(sorted(path.name for path in group) for group in groups), cache
+
+    def test_same_size_files_are_only_grouped_when_identical(self):
+        large = self.rng.randbytes(3 * PARTIAL_HASH_BYTES)
+        # Same size and same ends as large, different in the middle: only
+        # the full hash tells them apart
+        middle = bytearray(large)
+        middle[len(large) // 2] ^= 0xFF
+        small = self.rng.randbytes(1000)
+        files = [
+            self.write("large.webp", large),
+            self.write("large_copy.jpg", large),
+            self.write("large_middle.webp", bytes(middle)),
+            self.write("small.png", small),
+            self.write("small_copy.png", small),
+            self.write("small_other.png", self.rng.randbytes(1000)),
+            self.write("unique.webp", self.rng.randbytes(1234)),
+        ]
+
+        groups, cache = self.groups(files)
+
+        self.assertEqual(groups, [["large.webp", "large_copy.jpg"], ["small.png", "small_copy.png"]])
+        # Full hashes only for the large files whose ends collide
+        self.assertEqual(
+            sorted(Path(key).name for key in cache.entries),
+            ["large.webp", "large_copy.jpg", "large_middle.webp"],
+        )
+
+    def test_ends_differ(self):
+        data = self.rng.randbytes(3 * PARTIAL_HASH_BYTES)
+        changed_end = data[:-1] + bytes([data[-1] ^ 1])
+        files = [self.write("a.webp", data), self.write("b.webp", changed_end)]
+
+        groups, cache = self.groups(files)
+
+        self.assertEqual(groups, [])
+        self.assertEqual(cache.entries, {})
+
+    def test_no_same_size_files(self):
+        files = [self.write(f"{size}.webp", self.rng.randbytes(size)) for size in (10, 20, 30)]
+
+        self.assertEqual(self.groups(files)[0], [])
+
+
+class MissingReferenceTests(unittest.TestCase):
+    def setUp(self):
+        self.references = ReferenceIndex(REPO_ROOT, sources=[])
+        self.references.add("content/images/live.webp", "blog.html:10")
+        self.references.add("content/images/live.webp", "content/typepad_export_cleaned.txt:5")
+        self.references.add("content/images/draft.webp", "content/blog.yaml:3")
+        self.references.add("content/images/old.jpg", "content/typepad_export_cleaned.txt:7")
+        self.references.add("content/images/old.jpg", "review-old/blogs-data.json:2")
+        self.references.add("content/images/exists.webp", "blog.html:11")
+
+    def test_archive_only_references_are_counted(self):
+        missing, archived = missing_references(self.references, {"exists.webp"})
+
+        self.assertEqual(missing, {"live.webp": ["blog.html:10"], "draft.webp": ["content/blog.yaml:3"]})
+        self.assertEqual(archived, 1)
+
+    def test_scope_limits_the_referrers(self):
+        scope = {(REPO_ROOT / "content" / "blog.yaml").resolve()}
+        missing, _ = missing_references(self.references, {"exists.webp"}, scope)
+
+        self.assertEqual(missing, {"draft.webp": ["content/blog.yaml:3"]})
+
+
+class IndexGroupTests(unittest.TestCase):
+    def order(self, sizes, shown=()):
+        stats = {path: SimpleNamespace(st_size=size) for path, size in sizes.items()}
+        root_of = {path: next(root for root in INDEX_ROOTS if root in path.parents) for path in sizes}
+        return order_index_group(list(sizes), stats, root_of, set(shown))
+
+    def test_shown_copy_is_kept_and_its_source_left_out(self):
+        webp = IMAGES_DIR / "20250529_buitengewoon_texel.webp"
+        jpg = IMAGES_DIR / "20250529_buitengewoon_texel.jpg"
+        old = INDEX_ROOTS[1] / "6a01-320wi.png"
+
+        self.assertEqual(self.order({jpg: 156_500, old: 155_100, webp: 89_600}, shown=[webp]), [webp, old])
+
+    def test_primary_folder_before_size(self):
+        primary = IMAGES_DIR / "a.webp"
+        old = INDEX_ROOTS[1] / "a.jpg"
+
+        self.assertEqual(self.order({old: 200_000, primary: 10_000}), [primary, old])
+
+    def test_largest_when_nothing_else_decides(self):
+        small = INDEX_ROOTS[1] / "small.jpg"
+        large = INDEX_ROOTS[2] / "large.jpg"
+
+        self.assertEqual(self.order({small: 10, large: 20}), [large, small])
+
+    def test_conversion_pair_alone_is_no_group(self):
+        self.assertIsNone(self.order({IMAGES_DIR / "a.jpg": 20, IMAGES_DIR / "a.webp": 10}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import sys
+import unittest
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from resize_images import VARIANTS_DIR, variant_path  # noqa: E402
+
+
+class VariantPathTests(unittest.TestCase):
+    def test_same_name_in_different_folders(self):
+        first = variant_path(Path("content/images/2024/optreden.webp"), 640)
+        second = variant_path(Path("content/images/2025/optreden.webp"), 640)
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(first.parent, VARIANTS_DIR)
+        self.assertEqual(second.parent, VARIANTS_DIR)
+
+    def test_name_is_stable_and_readable(self):
+        src = Path("content/images/optreden.webp")
+        path = variant_path(src, 320)
+
+        self.assertEqual(path, variant_path(src, 320))
+        self.assertNotEqual(path, variant_path(src, 640))
+        self.assertTrue(path.name.startswith("optreden-"))
+        self.assertTrue(path.name.endswith("-320w.webp"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from validate_content import SCHEMAS, validate  # noqa: E402
+
+BLOG = Path("content/blog.yaml")
+REPERTOIRE = Path("content/repertoire.yaml")
+
+BLOG_ENTRY = """- title: Eerste optreden
+  date: 14 september 2025
+  image: content/images/20250914_eerste.webp
+  content: |
+    Een zin: met een dubbele punt.
+"""
+
+
+class ValidateTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+
+    def validate(self, path, text):
+        full = self.root / path
+        full.parent.mkdir(parents=True, exist_ok=True)
+        full.write_text(text, encoding="utf-8")
+        return validate(path, SCHEMAS[path], self.root)
+
+    def messages(self, path, text):
+        return [(problem.line, problem.message) for problem in self.validate(path, text)[1]]
+
+    def test_valid_file(self):
+        self.assertEqual(self.validate(BLOG, BLOG_ENTRY + "\n" + BLOG_ENTRY.replace("Eerste", "Tweede")), (2, []))
+
+    def test_empty_and_comment_only_files(self):
+        for text in ("", "# Nog geen berichten\n"):
+            self.assertEqual(self.messages(BLOG, text), [(1, "must contain a list of entries")])
+
+    def test_parse_error(self):
+        messages = self.messages(BLOG, BLOG_ENTRY.replace("title: Eerste optreden", 'title: "a\\qb"'))
+
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0][0], 1)
+        self.assertTrue(messages[0][1].startswith("YAML: "))
+
+    def test_unknown_field(self):
+        text = BLOG_ENTRY.replace("  content:", "  locatie: Texel\n  content:")
+
+        self.assertEqual(self.messages(BLOG, text), [(4, "unknown field 'locatie'")])
+
+    def test_bad_date(self):
+        text = BLOG_ENTRY.replace("14 september 2025", "14 septembre 2025")
+
+        self.assertEqual(self.messages(BLOG, text), [(2, "'date' is not a Dutch date: '14 septembre 2025'")])
+
+    def test_duplicate_id(self):
+        text = "- id: 1\n  title: Een\n- id: 2\n  title: Twee\n- id: 1\n  title: Drie\n"
+
+        self.assertEqual(self.messages(REPERTOIRE, text), [(5, "duplicate id '1' (first on line 1)")])
+
+    def test_missing_field_and_repeated_field(self):
+        text = BLOG_ENTRY.replace("  image: content/images/20250914_eerste.webp\n", "  title: Nog een titel\n")
+
+        self.assertEqual(
+            self.messages(BLOG, text),
+            [(1, "missing required field 'image'"), (3, "field 'title' is repeated")],
+        )
+
+    def test_unquoted_colon_on_a_continuation_line(self):
+        text = BLOG_ENTRY.replace("  content: |\n    Een zin: met een dubbele punt.\n", "  content: Een zin\n    met: een dubbele punt\n")
+
+        self.assertTrue(self.messages(BLOG, text))
+
+
+if __name__ == "__main__":
+    unittest.main()
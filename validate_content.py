@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Check the YAML content files against a declared schema.
+
+Each file in SCHEMAS is a list of flat entries. The check runs in-process in
+a few tens of milliseconds (PyYAML's C parser, no Ruby), so it also works as
+a pre-commit hook:
+
+    printf '#!/bin/sh\\nexec python3 validate_content.py\\n' > .git/hooks/pre-commit
+    chmod +x .git/hooks/pre-commit
+
+Syntax: the file must parse as YAML (as js-yaml on the site parses it), and
+every line must be blank, a comment, "- key: value" (a new entry),
+"  key: value", or more deeply indented text continuing the value above
+(block scalar or multi-line string). The line checks name every unquoted
+": ", leading indicator, unclosed quote and repeated key (which js-yaml
+rejects but PyYAML accepts); the parser finds what they cannot see, such as
+bad escapes or a block scalar losing its indentation, but stops at its
+first error.
+
+Schema, on the parsed values: required fields present (and non-empty
+unless allowed), no unknown or nested fields, dates readable by
+parse_dutch_date, and unique values where the schema asks for them
+(repertoire ids).
+
+Problems are printed as path:line: message.
+
+Usage:
+    python validate_content.py                      # All files in SCHEMAS
+    python validate_content.py content/blog.yaml    # Only these files
+"""
+from __future__ import annotations
+
+import argparse
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+import yaml
+
+from blog_yaml import FIELD_LINE, BlogYaml, parse_dutch_date
+
+# The C parser when PyYAML was built with libyaml
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+REPO_ROOT = Path(__file__).resolve().parent
+BLOCK_INDICATOR = re.compile(r"^[|>][+-]?\d?$")
+# Plain scalars may not start with these (quote the value instead)
+RESERVED_STARTS = ("@", "`", "&", "*", "!", "%", "[", "{", "- ", "? ", ",")
+
+
+@dataclass(frozen=True)
+class Schema:
+    """Fields of an entry: which must be there, which may, and what they hold."""
+    required: tuple[str, ...]
+    optional: tuple[str, ...] = ()
+    # Required fields that may be left empty (a post without a photo)
+    may_be_empty: tuple[str, ...] = ()
+    # Fields holding a Dutch date ("14 september 2025")
+    dates: tuple[str, ...] = ()
+    # Fields whose value must differ between entries
+    unique: tuple[str, ...] = ()
+
+
+SCHEMAS = {
+    Path("content/blog.yaml"): Schema(
+        required=("title", "date", "image", "content"),
+        optional=("link",),
+        may_be_empty=("image",),
+        dates=("date",),
+    ),
+    Path("content/agenda.yaml"): Schema(
+        required=("date", "location", "event"),
+        dates=("date",),
+    ),
+    Path("content/repertoire.yaml"): Schema(
+        required=("id", "title"),
+        optional=("youtube",),
+        unique=("id",),
+    ),
+}
+
+
+@dataclass(frozen=True)
+class Problem:
+    path: Path
+    line: int
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path.as_posix()}:{self.line}: {self.message}"
+
+
+def plain_value(value: str) -> str:
+    """A value without its quotes and trailing comment."""
+    if value[:1] in ("'", '"'):
+        end = closing_quote(value)
+        return value[1:end] if end is not None else value[1:]
+    return re.split(r"\s#", value, maxsplit=1)[0].rstrip()
+
+
+def closing_quote(value: str, start: int = 1) -> int | None:
+    """Index of the quote closing value[0] (searching from start), or None."""
+    quote = value[0]
+    i = start
+    while i < len(value):
+        if quote == '"' and value[i] == "\\":
+            i += 2
+            continue
+        if value[i] == quote:
+            # '' is an escaped quote inside a single-quoted string
+            if quote == "'" and value[i + 1:i + 2] == "'":
+                i += 2
+                continue
+            return i
+        i += 1
+    return None
+
+
+def value_problem(value: str) -> str | None:
+    """What is wrong with a one-line value as YAML, if anything."""
+    if not value or value.startswith("#") or BLOCK_INDICATOR.match(value):
+        return None
+    if value[0] in ("'", '"'):
+        end = closing_quote(value)
+        if end is None:
+            return None  # may close on a continuation line, checked there
+        rest = value[end + 1:].strip()
+        if rest and not rest.startswith("#"):
+            return f"text after the closing quote: {rest!r}"
+        return None
+    value = plain_value(value)
+    if value.startswith(RESERVED_STARTS):
+        return f"value starts with {value[0]!r}; put it in quotes"
+    if ": " in value or value.endswith(":"):
+        return "unquoted value contains ': '; put it in quotes"
+    return None
+
+
+def check_syntax(path: Path, text: str) -> list[Problem]:
+    problems = []
+    continuation = False  # lines indented deeper belong to the value above
+    open_quote: tuple[str, int] | None = None  # (quoted text so far, line)
+    names: set[str] = set()  # fields of the current entry
+    for number, line in enumerate(text.splitlines(), 1):
+        stripped = line.strip()
+        indent = len(line) - len(line.lstrip(" \t"))
+        if "\t" in line[:indent]:
+            problems.append(Problem(path, number, "tab in indentation"))
+        if continuation and (not stripped or indent > 2):
+            if open_quote is not None:
+                quoted = open_quote[0] + " " + stripped
+                if closing_quote(quoted) is not None:
+                    problem = value_problem(quoted)
+                    if problem:
+                        problems.append(Problem(path, number, problem))
+                    open_quote = None
+                else:
+                    open_quote = (quoted, open_quote[1])
+            continue
+        if open_quote is not None:
+            problems.append(Problem(path, open_quote[1], "quoted value is never closed"))
+            open_quote = None
+        continuation = False
+        if not stripped or stripped.startswith("#"):
+            continue
+        match = FIELD_LINE.match(line)
+        if not match:
+            problems.append(Problem(path, number, "expected '- key: value' or '  key: value'"))
+            continue
+        if match.group(1) == "- ":
+            names = set()
+        if match.group(2) in names:
+            # BlogYaml (like a YAML mapping) keeps only one of them
+            problems.append(Problem(path, number, f"field '{match.group(2)}' is repeated"))
+        names.add(match.group(2))
+        value = match.group(3)
+        problem = value_problem(value)
+        if problem:
+            problems.append(Problem(path, number, problem))
+        if value[:1] in ("'", '"') and closing_quote(value) is None:
+            open_quote = (value, number)
+        continuation = True
+    if open_quote is not None:
+        problems.append(Problem(path, open_quote[1], "quoted value is never closed"))
+    return problems
+
+
+def check_parse(path: Path, text: str) -> tuple[list | None, list[Problem]]:
+    """The parsed file, or None and the parser's error."""
+    try:
+        return yaml.load(text, Loader=YAML_LOADER), []
+    except yaml.YAMLError as e:
+        mark = getattr(e, "problem_mark", None)
+        problem = getattr(e, "problem", None) or str(e)
+        return None, [Problem(path, mark.line + 1 if mark else 1, f"YAML: {problem}")]
+
+
+def text_value(value) -> str:
+    """A parsed scalar as the site shows it ("" for an empty value)."""
+    return "" if value is None else str(value).strip()
+
+
+def check_schema(path: Path, data, blog: BlogYaml, schema: Schema) -> list[Problem]:
+    """Check the parsed entries; blog (the same text) gives the line numbers."""
+    if not isinstance(data, list) or not data:
+        return [Problem(path, 1, "must contain a list of entries")]
+    if len(data) != len(blog.entries):
+        # Some item is not written as "- key: value" lines; check_syntax names it
+        return [Problem(path, 1, f"{len(data)} entries parsed but {len(blog.entries)} written as '- key: value'")]
+    problems = []
+    allowed = set(schema.required) | set(schema.optional)
+    seen: dict[str, dict[str, int]] = {name: {} for name in schema.unique}
+    for item, entry in zip(data, blog.entries):
+        if not isinstance(item, dict):
+            problems.append(Problem(path, entry.line, "entry is not a mapping of fields"))
+            continue
+        lines = {name: field.line for name, field in entry.fields.items()}
+        for name, value in item.items():
+            line = lines.get(name, entry.line)
+            if name not in allowed:
+                problems.append(Problem(path, line, f"unknown field '{name}'"))
+            if isinstance(value, (dict, list)):
+                problems.append(Problem(path, line, f"'{name}' must be a single value"))
+        for name in schema.required:
+            if name not in item:
+                problems.append(Problem(path, entry.line, f"missing required field '{name}'"))
+            elif not text_value(item[name]) and name not in schema.may_be_empty:
+                problems.append(Problem(path, lines.get(name, entry.line), f"'{name}' is empty"))
+        for name in schema.dates:
+            value = text_value(item.get(name))
+            if value and not parse_dutch_date(value):
+                problems.append(Problem(path, lines.get(name, entry.line), f"'{name}' is not a Dutch date: {value!r}"))
+        for name in schema.unique:
+            if name not in item:
+                continue
+            value = text_value(item[name])
+            line = lines.get(name, entry.line)
+            if value in seen[name]:
+                problems.append(Problem(
+                    path, line, f"duplicate {name} {value!r} (first on line {seen[name][value]})",
+                ))
+            else:
+                seen[name][value] = line
+    return problems
+
+
+def validate(path: Path, schema: Schema, root: Path = REPO_ROOT) -> tuple[int, list[Problem]]:
+    """Number of entries and the problems of one content file."""
+    full = root / path
+    try:
+        text = full.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError) as e:
+        return 0, [Problem(path, 1, f"cannot read: {e}")]
+    blog = BlogYaml(text, full)
+    problems = check_syntax(path, text)
+    data, parse_problems = check_parse(path, text)
+    # The parser's first error is usually one the line checks already named
+    problems += [problem for problem in parse_problems if problem.line not in {p.line for p in problems}]
+    if not parse_problems:
+        # An empty or comment-only file parses as None: "must contain a list"
+        problems += check_schema(path, data, blog, schema)
+    return len(blog.entries), sorted(problems, key=lambda problem: problem.line)
+
+
+def validate_all(paths: list[Path] | None = None, root: Path = REPO_ROOT) -> dict[Path, tuple[int, list[Problem]]]:
+    """validate() for paths (default: every file in SCHEMAS)."""
+    return {path: validate(path, SCHEMAS[path], root) for path in paths or SCHEMAS}
+
+
+def report(results: dict[Path, tuple[int, list[Problem]]]) -> bool:
+    """Print one line per valid file and every problem; True if all are valid."""
+    ok = True
+    for path, (count, problems) in results.items():
+        if problems:
+            ok = False
+            print(f"YAML errors in {path.as_posix()}: {len(problems)}")
+            for problem in problems:
+                print(f"  {problem}")
+        else:
+            print(f"YAML OK: {path.as_posix()} ({count} entries)")
+    return ok
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Check the YAML content files against their schema.")
+    parser.add_argument("files", nargs="*", type=Path, help=f"Files to check (default: {len(SCHEMAS)} content files)")
+    args = parser.parse_args(argv)
+    unknown = [path for path in args.files if path not in SCHEMAS]
+    if unknown:
+        parser.error(f"no schema for: {', '.join(map(str, unknown))}")
+    return 0 if report(validate_all(args.files)) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())